@@ -6,11 +6,21 @@
 '''
 
 #%%
-from profiler_decorator import profile
+from profiler_decorator import timed
 import numpy as np
+import os
+import time
 from environment import Environment
-from Qmodel import quantum_model
-import scipy.special as sp
+from Qmodel import prefix_cache
+from su2 import make_model
+
+
+def softmax(x):
+    '''
+    Numerically stable softmax of a 1D array (same operations as scipy.special.softmax, avoids importing scipy)
+    '''
+    exp_x = np.exp(x - np.max(x))
+    return exp_x / np.sum(exp_x)
 
 
 class Agent:
@@ -28,6 +38,15 @@ class Agent:
     softmax = True
     sarsa = False
     reward_bool = False
+    best_protocol = None
+    best_actions = None
+    best_reward = -1
+    cache = None
+    symmetric = False
+    decay_steps = 10
+    decay_temperature = 8
+    n_rollouts = 0
+    stats = None
     
     # initialize
     def __init__(self, nsteps, nactions, qtable=None, **kwargs): 
@@ -43,6 +62,11 @@ class Agent:
             lambda: float, lambda parameter for eligibility trace update
             softmax: boolean, decides whether to use softmax behavioural policy or not
             sarsa: (old) boolean, decides whether to use off-policy algorithm version
+            cache_size: integer, maximum number of quantum states stored in the prefix cache used to skip the simulation of
+                        already visited protocol prefixes (see Qmodel.prefix_cache). If not given no cache is used
+            symmetric: boolean, if True the agent chooses only the first half of a time-reflected protocol h(t) = -h(T-t) (nsteps is then
+                       the number of decision steps, half the steps of the protocol, see Environment.final_reward)
+            decay_steps, decay_temperature: integer, float, default max_steps and T of the epsilon decay (see update_greedyness)
         
         If qtable is not given as input, initalizes it together with the eligibility trace
         '''
@@ -59,16 +83,25 @@ class Agent:
             self.softmax = kwargs.get('softmax')
         if 'sarsa' in kwargs:
             self.sarsa = kwargs.get('sarsa')
+        if 'symmetric' in kwargs:
+            self.symmetric = kwargs.get('symmetric')
+        if 'decay_steps' in kwargs:
+            self.decay_steps = kwargs.get('decay_steps')
+        if 'decay_temperature' in kwargs:
+            self.decay_temperature = kwargs.get('decay_temperature')
+        if kwargs.get('cache_size'):
+            # the cache must at least hold a whole episode
+            self.cache = prefix_cache(max(kwargs.get('cache_size'), 2*self.nsteps))
 
         self._init_qtable()
         self._init_trace()
         if qtable is not None:
             qtable = np.array(qtable)
             # Check whether the imported qtable has the correct shape
-            if np.shape(qtable)==[self.nstates, self.nactions]:
-                self.qtable = qtable
+            if np.shape(qtable)==(self.nstates, self.nactions):
+                self.qtable = np.array(qtable, dtype=float)
             else: 
-                print("WARNING ----> Qtable size doesn't match given arguments \n [nstates*nactions, nactions]=", [self.nstates*self.nactions, self.nactions], "\n Given:", np.shape(qtable))
+                print("WARNING ----> Qtable size doesn't match given arguments \n [nsteps*nactions, nactions]=", [self.nstates, self.nactions], "\n Given:", np.shape(qtable))
 
     def _init_qtable(self):
         '''
@@ -93,7 +126,24 @@ class Agent:
         all_actions: list of integers, contains the possible action values (control field values)
         history: (optional) boolean, decides whether to store the path history or not
         '''
-        self.env = Environment(model, starting_action, all_actions, history)
+        self.env = Environment(model, starting_action, all_actions, history, nsteps=self.nsteps, symmetric=self.symmetric)
+
+    @property
+    def protocol(self):
+        '''
+        View of the field values of the last episode stored in the environment recorder
+        '''
+        return self.env.recorder.protocol
+
+    def _store_best(self, protocol, actions):
+        '''
+        Copies protocol (field values) and actions (indices) into the preallocated best protocol arrays
+        '''
+        if self.best_protocol is None or len(self.best_protocol) != len(protocol):
+            self.best_protocol = np.zeros(len(protocol), dtype=float)
+            self.best_actions = np.zeros(len(protocol), dtype=int)
+        np.copyto(self.best_protocol, protocol)
+        np.copyto(self.best_actions, actions)
 
     def extract_state(self):
         '''
@@ -113,6 +163,7 @@ class Agent:
         return state_dict
 
     # action policy: implements epsilon greedy and softmax
+    @timed("action_selection")
     def select_action(self, state, epsilon, greedy=False, replay=False):
         '''
         Selects action given the state and outputs the index of the chosen action
@@ -127,8 +178,7 @@ class Agent:
         indA: integer, index of the selected action
         '''
         if replay: #action is that of the best protocol at that time step
-            action = self.best_protocol[self.env.time_step] #action is not indexed, is the actual value
-            indA = self.env.action_map_dict[action] #return indexed version
+            indA = self.best_actions[self.env.time_step] #indexed version of the best protocol
 
         else:
             qval = self.qtable[state] #selects a row in qtable
@@ -141,7 +191,7 @@ class Agent:
                 if (self.softmax):
                     if epsilon==0: epsilon=1
                     # use Softmax policy
-                    prob = sp.softmax(qval / epsilon) #epsilon controls the "temperature" in the softmax
+                    prob = softmax(qval / epsilon) #epsilon controls the "temperature" in the softmax
                     indA = np.random.choice(range(0, self.nactions), p = prob)
                 
                 else:
@@ -163,6 +213,7 @@ class Agent:
         
 
     # update function (Sarsa and Q-learning)
+    @timed("q_update")
     def update(self, action, alpha, epsilon):
         '''
         Given the chosen action, moves the environment to the next state and updates the Q-table
@@ -199,6 +250,16 @@ class Agent:
         self.trace *= (self.discount * self.lmbda)
 
 
+    def _evolve(self, field):
+        '''
+        Evolves the environment model with the given field, through the prefix cache if present
+        '''
+        if self.cache is not None:
+            self.cache.evolve(self.env.model, field)
+        else:
+            self.env.model.evolve(field)
+
+
     # simple output directory selector
     def get_out_dir(self):
         if self.sarsa==True:
@@ -210,7 +271,7 @@ class Agent:
         return name
 
 
-    #@profile(sort_args=['name'], print_args=[80])
+    @timed("train_episode")
     def train_episode(self, starting_action, alpha, epsilon, replay=False):
         '''
         Trains the Agent for a given episode
@@ -224,8 +285,9 @@ class Agent:
         # intialize environement
         self.env.reset(starting_action)
         self.env.model.reset()
+        if self.cache is not None:
+            self.cache.reset(self.env.model)
         self._init_trace()
-        self.protocol = []
 
         for step in range(self.nsteps):
 
@@ -235,19 +297,43 @@ class Agent:
             action = self.select_action(self.env.state.current, epsilon, replay=replay) #greedy=False by default
 
             # evolve quantum model
-            self.env.model.evolve(self.env.all_actions[action])
+            self._evolve(self.env.all_actions[action])
 
-            # move environement current ---> previous
+            # move environement current ---> previous (the action is recorded in the environment recorder)
             self.env.move(action, self.reward_bool)
 
-            # append action to protocol
-            self.protocol.append(self.env.all_actions[self.env.state.action])
-
             # update agent's Q-table
             self.update(action, alpha, epsilon)
+
+
+    def learn_from_episode(self, starting_action, actions, reward, alpha, epsilon, explored=None):
+        '''
+        Applies the Q-table updates of an episode simulated elsewhere (e.g. by an actor process, see actor_learner.py) without evolving the model
+
+        INPUTS:
+        starting_action: integer, index of the starting action used to initialize the environment
+        actions: list of integers of size [nsteps], indices of the actions taken in the episode
+        reward: float, final reward (fidelity) of the episode
+        alpha: float, episode learning rate
+        epsilon: float, episode epsilon parameter
+        explored: (optional) list of booleans of size [nsteps], True for the non greedy actions (the eligibility trace is reset as in select_action)
+        '''
+        self.env.reset(starting_action)
+        self._init_trace()
+
+        for step in range(self.nsteps):
+
+            self.reward_bool = (step == self.nsteps - 1)
+            if explored is not None and explored[step]:
+                self._init_trace()
+            action = int(actions[step])
+            self.env.move(action, self.reward_bool, reward=reward)
+            self.update(action, alpha, epsilon)
             
 
-    def train_agent(self, starting_action, episodes, alpha_vec, replay_freq, replay_episodes, verbose=False, epsilon_i=1, epsilon_f=0, conv_check=10):
+    def train_agent(self, starting_action, episodes, alpha_vec, replay_freq, replay_episodes, verbose=False, epsilon_i=1, epsilon_f=0, conv_check=10,
+                    early_stop=None, stop_tol=1e-3, checkpoint=None, checkpoint_freq=1000, resume=False, log_file=None, flush_freq=1000,
+                    progress=True):
         '''
         Simple wrapper for training procedure
 
@@ -261,65 +347,148 @@ class Agent:
         epsilon_i: (optional) float, starting epsilon value for RB-epsiolon-D
         epsilon_f: (optional) float, final epsilon value for RB-epsiolon-D
         conv_check: (optional) integer, number of test protocols used at the end of the training to check Q-table convergence
+        early_stop: (optional) integer, window (in episodes) used by the convergence-based stopping policy (see check_stopping). If None the full
+                    number of episodes is run
+        stop_tol: (optional) float, tolerance on the moving average plateau and on the gap between greedy and best protocol fidelity
+        checkpoint: (optional) string or Path, file where the training state is periodically saved (see save_checkpoint). If None no checkpoint is written
+        checkpoint_freq: (optional) integer, number of episodes between two checkpoints
+        resume: (optional) boolean, if True and the checkpoint file exists the training continues from the saved state
+        log_file: (optional) string or Path, .npy file of shape [3, total episodes+1] (rows: rewards, mavg_rewards, epsilons) memory-mapped
+                  during the training and flushed every flush_freq episodes. If None the logs are kept in memory
+        flush_freq: (optional) integer, number of episodes between two flushes of log_file
+        progress: (optional) boolean, shows the tqdm progress bar of the episodes
+
+        If a best protocol was seeded before training (see seed_protocol) it is kept as starting best protocol.
+        Throughput metrics of the run (episodes, replay episodes, greedy rollouts, evolution steps, cache hits, time per phase and
+        episodes per second) are stored in the stats attribute.
+        The logs are written into preallocated float32 arrays whose size accounts for the replay episodes.
 
         OUTPUTS:
-        rewards: list of floats of size [episodes], contains the rewards obtained per episode
-        mavg_rewards: list of floats of size [episodes+1], contains the incremental moving average over the obtained rewards
-        epsilons: list of floats of size [episodes+1], contains the epsilons found during training with RB-epsilon-D
+        rewards: np.array(dtype=float32) of size [total episodes+1], contains the rewards obtained per episode (the last one is the greedy protocol reward)
+        mavg_rewards: np.array(dtype=float32) of size [total episodes+1], contains the incremental moving average over the obtained rewards
+        epsilons: np.array(dtype=float32) of size [total episodes+1], contains the epsilons found during training with RB-epsilon-D
 
         '''
         from tqdm import tqdm
 
+        # Preallocate logs: rewards (one per episode plus the final test), moving average and epsilons (one per episode plus the initial value)
+        total_episodes = episodes + ((episodes-1)//replay_freq)*replay_episodes
+        if log_file is not None:
+            # always a new file: on resume the logs are refilled from the checkpoint (the file may have been truncated by an early stop)
+            logs = np.lib.format.open_memmap(log_file, mode='w+', dtype=np.float32, shape=(3, total_episodes+1))
+        else:
+            logs = np.zeros([3, total_episodes+1], dtype=np.float32)
+        n_log = 0
+
         # Train agent
-        rewards = []
-        self.best_reward = -1
+        # Keep the best protocol only if it was seeded before training (see seed_protocol)
+        if self.best_protocol is None:
+            self.best_reward = -1
 
         #############################
         self.epsilon_f = epsilon_f
         self.epsilon_i = epsilon_i
-        epsilons = [self.epsilon_i]
         epsilon = self.epsilon_i
+        logs[2, 0] = epsilon
         self.counter = 0
-        mavg_rewards = [0]
+        mavg = 0
+        logs[1, 0] = mavg
         avg_reward = 0
         self.avg_reward = avg_reward
         #############################
+        self.stop_reason = None
+        self.stop_episode = None
+        self._greedy_policy = None
+        self._policy_since = 0
+        self._mavg_log = []
+        #############################
 
-        for index in tqdm(range(episodes)):
+        start = 0
+        if resume and checkpoint is not None:
+            if os.path.exists(checkpoint):
+                index, epsilon, mavg, n_log = self.load_checkpoint(checkpoint, episodes, logs)
+                start = index + 1
+                print("Resuming training from episode", start)
+            else:
+                print("WARNING ----> Checkpoint file", checkpoint, "not found, starting a new training")
 
+        stats = {"episodes": 0, "replay_episodes": 0, "time_training": 0., "time_replay": 0., "time_stopping": 0., "time_io": 0., "time_test": 0.}
+        start_time = time.perf_counter()
+        start_rollouts = self.n_rollouts
+        start_evolve = getattr(self.env.model, 'n_evolve', 0)
+        if self.cache is not None:
+            start_hits, start_misses = self.cache.hits, self.cache.misses
+
+        for index in tqdm(range(start, episodes), initial=start, total=episodes, disable=not progress):
+
+            clock = time.perf_counter()
             self.train_episode(starting_action, alpha_vec[index], epsilon, replay=False)
-            rewards.append(self.env.reward)
-            mavg_rewards.append(((mavg_rewards[-1]*index) + self.env.reward)/(index+1))
+            stats["episodes"] += 1
+            mavg = ((mavg*index) + self.env.reward)/(index+1)
 
             #############################
             if index%20==0:
-                epsilon = self.update_greedyness(episodes, index, epsilon, mavg_rewards[-1])
-            epsilons.append(epsilon)
+                epsilon = self.update_greedyness(episodes, index, epsilon, mavg)
             #############################
 
+            logs[0, n_log] = self.env.reward
+            n_log += 1
+            logs[1, n_log] = mavg
+            logs[2, n_log] = epsilon
+
             #### BEST REWARD/PROTOCOL UPDATE ####
             if self.best_reward < self.env.reward:
-                self.best_protocol = self.protocol
+                self._store_best(self.env.recorder.protocol, self.env.recorder.action_indices)
                 self.best_reward = self.env.reward
                 self.best_path = self.env.model.qstates_history
                 if verbose:
                     print('\nNew best protocol {} with reward {}'.format(index, self.best_reward))
+            stats["time_training"] += time.perf_counter() - clock
 
             # Replay episodes
+            clock = time.perf_counter()
             if index%replay_freq==0 and index!=0:
                 if verbose:
                     print("\n...Running replay epidosdes...")
                 for _ in range(replay_episodes):
                     self.train_episode(starting_action, alpha_vec[index], epsilon, replay=True)
-                    rewards.append(self.env.reward)
-                    mavg_rewards.append(((mavg_rewards[-1]*index) + self.env.reward)/(index+1))
-                    #############################
-                    epsilons.append(epsilon)
-                    #############################
+                    mavg = ((mavg*index) + self.env.reward)/(index+1)
+                    logs[0, n_log] = self.env.reward
+                    n_log += 1
+                    logs[1, n_log] = mavg
+                    logs[2, n_log] = epsilon
+                stats["replay_episodes"] += replay_episodes
+            stats["time_replay"] += time.perf_counter() - clock
+
+            #### CONVERGENCE-BASED STOPPING ####
+            if early_stop is not None and index%20==0:
+                clock = time.perf_counter()
+                self.stop_reason = self.check_stopping(starting_action, index, mavg, early_stop, stop_tol)
+                stats["time_stopping"] += time.perf_counter() - clock
+                if self.stop_reason is not None:
+                    self.stop_episode = index + 1
+                    print("\n----> Early stopping after {} episodes: {}".format(self.stop_episode, self.stop_reason))
+                    break
+
+            #### CHECKPOINT ####
+            clock = time.perf_counter()
+            if checkpoint is not None and (index+1)%checkpoint_freq==0:
+                self.save_checkpoint(checkpoint, index, episodes, epsilon, mavg, logs, n_log)
+
+            if log_file is not None and (index+1)%flush_freq==0:
+                logs.flush()
+            stats["time_io"] += time.perf_counter() - clock
 
         # Last point test
+        clock = time.perf_counter()
         _, reward = self.generate_protocol(starting_action)
-        rewards.append(reward)
+        logs[0, n_log] = reward
+        if log_file is not None:
+            logs.flush()
+            if n_log < total_episodes:
+                # training stopped early: rewrite the file without the unused tail
+                logs = np.array(logs[:, :n_log+1])
+                np.save(log_file, logs)
 
         # Test convergence
         if conv_check is not None:
@@ -333,11 +502,178 @@ class Agent:
                 print("!WARNING: The Q-table does not converge. Deviating {} from best protocol fidelity".format(error))
             else:
                 print("Learning seems to be fine!")
+        stats["time_test"] += time.perf_counter() - clock
+
+        #### THROUGHPUT METRICS ####
+        stats["time_total"] = time.perf_counter() - start_time
+        stats["greedy_rollouts"] = self.n_rollouts - start_rollouts
+        stats["evolve_calls"] = getattr(self.env.model, 'n_evolve', 0) - start_evolve
+        if self.cache is not None:
+            stats["cache_hits"] = self.cache.hits - start_hits
+            stats["cache_misses"] = self.cache.misses - start_misses
+        stats["episodes_per_second"] = (stats["episodes"] + stats["replay_episodes"])/max(stats["time_total"], 1e-12)
+        stats["evolve_per_second"] = stats["evolve_calls"]/max(stats["time_total"], 1e-12)
+        self.stats = stats
 
-        return rewards, mavg_rewards, epsilons
+        return logs[0, :n_log+1], logs[1, :n_log+1], logs[2, :n_log+1]
 
 
-    def update_greedyness(self, episodes, episode, epsilon, avg_reward, max_steps=10, T=8):
+    def save_checkpoint(self, fname, index, episodes, epsilon, mavg, logs, n_log):
+        '''
+        Atomically writes the training state to a binary .npz file: the file is written to a temporary file which then replaces
+        the old checkpoint, so that a crash during the writing never corrupts the last valid checkpoint.
+
+        INPUTS:
+        fname: string or Path, checkpoint file
+        index: integer, index of the last completed episode
+        episodes: integer, total number of episodes of the training
+        epsilon: float, current epsilon value
+        mavg: float, current moving average of the rewards
+        logs: np.array(dtype=float32) of size [3, total episodes+1], training logs (see train_agent)
+        n_log: integer, number of logged episodes
+        '''
+        rng_name, rng_keys, rng_pos, rng_has_gauss, rng_gauss = np.random.get_state()
+        greedy_policy = self._greedy_policy if self._greedy_policy is not None else np.zeros(0, dtype=int)
+        state = {
+            'index' : index,
+            'episodes' : episodes,
+            'epsilon' : epsilon,
+            'mavg' : mavg,
+            'n_log' : n_log,
+            'epsilon_i' : self.epsilon_i,
+            'epsilon_f' : self.epsilon_f,
+            'counter' : self.counter,
+            'avg_reward' : self.avg_reward,
+            'qtable' : self.qtable,
+            'trace' : self.trace,
+            'best_protocol' : np.array(self.best_protocol if self.best_protocol is not None else [], dtype=float),
+            'best_reward' : self.best_reward,
+            'best_path' : np.array(self.best_path if self.best_protocol is not None else [], dtype=complex),
+            'logs' : logs[:, :n_log+1],
+            'greedy_policy' : greedy_policy,
+            'policy_since' : self._policy_since,
+            'mavg_log' : np.array(self._mavg_log, dtype=float).reshape(-1, 2),
+            'rng_name' : rng_name,
+            'rng_keys' : rng_keys,
+            'rng_pos' : rng_pos,
+            'rng_has_gauss' : rng_has_gauss,
+            'rng_gauss' : rng_gauss
+            }
+        tmp = str(fname) + '.tmp'
+        with open(tmp, 'wb') as f:
+            np.savez(f, **state)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, fname)
+
+
+    def load_checkpoint(self, fname, episodes, logs):
+        '''
+        Restores the training state saved with save_checkpoint (Q-table, trace, epsilon schedule, best protocol, logs and RNG state)
+
+        INPUTS:
+        fname: string or Path, checkpoint file
+        episodes: integer, total number of episodes of the training (checked against the saved one)
+        logs: np.array(dtype=float32) of size [3, total episodes+1], preallocated training logs, filled with the saved ones
+
+        OUTPUTS:
+        index: integer, index of the last completed episode
+        epsilon: float, epsilon value at the checkpoint
+        mavg: float, moving average of the rewards at the checkpoint
+        n_log: integer, number of logged episodes
+        '''
+        with np.load(fname) as state:
+            if int(state['episodes']) != episodes:
+                print("WARNING ----> Checkpoint was saved for", int(state['episodes']), "episodes, resuming with", episodes)
+            self.epsilon_i = float(state['epsilon_i'])
+            self.epsilon_f = float(state['epsilon_f'])
+            self.counter = int(state['counter'])
+            self.avg_reward = float(state['avg_reward'])
+            self.qtable = state['qtable']
+            self.trace = state['trace']
+            if len(state['best_protocol']) > 0:
+                best_protocol = state['best_protocol']
+                self._store_best(best_protocol, [self.env.action_map_dict[h] for h in best_protocol])
+                self.best_path = list(state['best_path'])
+            self.best_reward = state['best_reward'][()]
+            self._greedy_policy = state['greedy_policy'] if len(state['greedy_policy']) > 0 else None
+            self._policy_since = int(state['policy_since'])
+            self._mavg_log = [(int(i), m) for i, m in state['mavg_log']]
+            np.random.set_state((str(state['rng_name']), state['rng_keys'], int(state['rng_pos']), int(state['rng_has_gauss']), float(state['rng_gauss'])))
+            index = int(state['index'])
+            epsilon = state['epsilon'][()]
+            mavg = state['mavg'][()]
+            n_log = int(state['n_log'])
+            logs[:, :n_log+1] = state['logs']
+        return index, epsilon, mavg, n_log
+
+
+    def check_stopping(self, starting_action, index, mavg_reward, window, tol):
+        '''
+        Convergence-based stopping policy. Three signals are tracked:
+            1) the greedy policy (argmax of the Q-table) is unchanged since at least window episodes
+            2) the moving average of the rewards changed less than tol over the last window episodes
+            3) the greedy protocol fidelity is within tol from the best protocol fidelity
+        The greedy rollout needed for 3) is run only when 1) and 2) are already satisfied.
+
+        INPUTS:
+        starting_action: integer, starting action index
+        index: integer, current episode index
+        mavg_reward: float, current moving average of the rewards
+        window: integer, number of episodes over which the signals have to be stable
+        tol: float, tolerance for signals 2) and 3)
+
+        OUTPUT:
+        reason: string describing why the training can be stopped, None if the signals do not agree
+        '''
+        # 1) greedy policy stability
+        greedy_policy = np.argmax(self.qtable, axis=1)
+        if self._greedy_policy is None or not np.array_equal(greedy_policy, self._greedy_policy):
+            self._greedy_policy = greedy_policy
+            self._policy_since = index
+
+        # 2) moving average plateau
+        self._mavg_log.append((index, mavg_reward))
+        while len(self._mavg_log) > 1 and self._mavg_log[1][0] <= index - window:
+            self._mavg_log.pop(0)
+        old_index, old_mavg = self._mavg_log[0]
+
+        if index - self._policy_since < window or index - old_index < window:
+            return None
+        drift = np.abs(mavg_reward - old_mavg)
+        if drift > tol:
+            return None
+
+        # 3) gap between greedy and best protocol
+        _, greedy_reward = self.generate_protocol(starting_action)
+        gap = np.abs(self.best_reward - greedy_reward)
+        if gap > tol:
+            return None
+
+        return "greedy policy stable for {} episodes, moving average drift {:.2e}, greedy-best gap {:.2e}".format(index - self._policy_since, drift, gap)
+
+
+    def seed_protocol(self, protocol):
+        '''
+        Evaluates a given protocol on the environment model and stores it as the current best protocol.
+        Useful to warm-start training from a protocol found with a different setting (e.g. a neighbouring T)
+
+        INPUTS:
+        protocol: list of floats of size [nsteps], control field values (must belong to all_actions). In symmetric mode the first half of the
+                  time-reflected protocol
+
+        OUTPUT:
+        best_reward: float, fidelity obtained with the given protocol on the current model
+        '''
+        self.env.model.reset()
+        self.env.model.evolve_from_protocol(protocol)
+        self._store_best(protocol, [self.env.action_map_dict[h] for h in protocol])
+        self.best_reward = self.env.final_reward(protocol)
+        self.best_path = self.env.model.qstates_history
+        return self.best_reward
+
+
+    def update_greedyness(self, episodes, episode, epsilon, avg_reward, max_steps=None, T=None):
         '''
         Reward-based-epsilon-decay
         Updates the greediness parameter given the episode and the reward 
@@ -347,11 +683,16 @@ class Agent:
         episode: integer, current episode index
         avg_reward: float, obtained reward
         max_steps: (optional) integer, decides how many steps to tolerate and how much increment to consider for reward threshold
-        T: (optional) float, is the temperature factor in the exponential decay of the epsilon parameter
+                   (default self.decay_steps)
+        T: (optional) float, is the temperature factor in the exponential decay of the epsilon parameter (default self.decay_temperature)
 
         OUTPUT:
         epsilon: float, epsilon value
         '''
+        if max_steps is None:
+            max_steps = self.decay_steps
+        if T is None:
+            T = self.decay_temperature
         if (avg_reward >= self.avg_reward) or (self.counter >= max_steps):
             self.avg_reward += (avg_reward-self.avg_reward)*(max_steps/100) # adds 10% of the increment
             epsilon = self.epsilon_f + (self.epsilon_i - self.epsilon_f)*np.exp(-T*episode/episodes)
@@ -371,11 +712,13 @@ class Agent:
             qstart: np.array(dtype=complex) of size [2^{L}], quantum starting state for the model custom class object
         '''
         # intialize environement
+        self.n_rollouts += 1
         self.env.reset(starting_action)
         if 'qstart' in kwargs: 
             self.env.model.qstart = kwargs.get('qstart')
         self.env.model.reset()
-        self.protocol = []
+        if self.cache is not None:
+            self.cache.reset(self.env.model)
 
         for step in range(self.nsteps):
 
@@ -385,15 +728,35 @@ class Agent:
             action = self.select_action(self.env.state.current, 0, greedy=True) #greedy=False by default
 
             # evolve quantum model
-            self.env.model.evolve(self.env.all_actions[action])
+            self._evolve(self.env.all_actions[action])
 
-            # move environement current ---> previous
+            # move environement current ---> previous (the action is recorded in the environment recorder)
             self.env.move(action, self.reward_bool)
 
-            # append action to protocol
-            self.protocol.append(self.env.all_actions[self.env.state.action])
+        return np.copy(self.protocol), self.env.reward
 
-        return self.protocol, self.env.reward
+
+def downsample_log(series, nbins=1000):
+    '''
+    Downsamples a training log (e.g. the rewards returned by Agent.train_agent) into nbins consecutive bins, useful to plot very long runs
+
+    INPUTS:
+    series: np.array of size [n], log to downsample
+    nbins: (optional) integer, number of bins
+
+    OUTPUTS:
+    centers: np.array of size [nbins], central episode of each bin
+    mean, minimum, maximum: np.arrays of size [nbins], statistics of the series in each bin
+    '''
+    series = np.asarray(series, dtype=float)
+    nbins = max(1, min(nbins, len(series)))
+    edges = np.linspace(0, len(series), nbins+1).astype(int)
+    counts = np.diff(edges)
+    mean = np.add.reduceat(series, edges[:-1])/counts
+    minimum = np.minimum.reduceat(series, edges[:-1])
+    maximum = np.maximum.reduceat(series, edges[:-1])
+    centers = (edges[:-1] + edges[1:] - 1)/2
+    return centers, mean, minimum, maximum
 
 
 def protocol_analysis(qstart, qtarget, t_max_vec, n_steps, all_actions, **kwargs):
@@ -414,6 +777,11 @@ def protocol_analysis(qstart, qtarget, t_max_vec, n_steps, all_actions, **kwargs
         episodes: integer, number of episodes to run
         replay_freq: integer, number of episodes to run before each replay session
         replay_episodes: integer, number of replay episodes to run during replay session
+        continuation: boolean, if True the Q-table and best protocol at T_max are used to warm-start the training at the next T_max
+        cont_fraction: float, fraction of episodes used as first training budget for warm-started runs
+        cont_epsilon: float, starting epsilon value for warm-started runs
+        cont_tol: float, fidelity tolerance w.r.t. the previous T_max before the budget of a warm-started run is doubled
+        alpha_i, alpha_f: floats, initial and final learning rate of the linear schedule
 
     OUTPUT:
     fidelities: list of floats, containing the final fidelities obtained after training for each T_max
@@ -426,6 +794,12 @@ def protocol_analysis(qstart, qtarget, t_max_vec, n_steps, all_actions, **kwargs
     episodes = 20001
     replay_freq=50
     replay_episodes=40
+    continuation = False
+    cont_fraction = 0.2
+    cont_epsilon = 0.3
+    cont_tol = 1e-3
+    a = 0.9
+    eta = 0.89
 
     if 'L' in kwargs:
         L = kwargs.get('L')
@@ -445,26 +819,65 @@ def protocol_analysis(qstart, qtarget, t_max_vec, n_steps, all_actions, **kwargs
     if 'replay_episodes' in kwargs:
         replay_episodes = kwargs.get('replay_episodes')
         print("Overwritten default replay_episodes with:", replay_episodes)
-
-    # alpha value
-    a=0.9; eta=0.89
-    alpha = np.linspace(a, eta, episodes)
+    if 'continuation' in kwargs:
+        continuation = kwargs.get('continuation')
+        print("Overwritten default continuation with:", continuation)
+    if 'cont_fraction' in kwargs:
+        cont_fraction = kwargs.get('cont_fraction')
+        print("Overwritten default cont_fraction with:", cont_fraction)
+    if 'cont_epsilon' in kwargs:
+        cont_epsilon = kwargs.get('cont_epsilon')
+        print("Overwritten default cont_epsilon with:", cont_epsilon)
+    if 'cont_tol' in kwargs:
+        cont_tol = kwargs.get('cont_tol')
+        print("Overwritten default cont_tol with:", cont_tol)
+    if 'alpha_i' in kwargs:
+        a = kwargs.get('alpha_i')
+        print("Overwritten default alpha_i with:", a)
+    if 'alpha_f' in kwargs:
+        eta = kwargs.get('alpha_f')
+        print("Overwritten default alpha_f with:", eta)
 
     fidelities = []
+    total_episodes = 0
+    previous = None
     for t_max in t_max_vec:
         print("\n Running training for T={}".format(t_max))
 
         dt = t_max/n_steps
-        model = quantum_model(qstart, qtarget, dt, L, g, all_actions)
-
-        # initialize the agent
-        learner = Agent(n_steps, len(all_actions))
-        learner._init_evironment(model, starting_action, all_actions)
-        # train
-        _ = learner.train_agent(starting_action, episodes, alpha, replay_freq, replay_episodes, verbose=False)
-        print("Found protocol with fidelity:", learner.best_reward)
+        model = make_model(qstart, qtarget, dt, L, g, all_actions)
+
+        if continuation and previous is not None:
+            # warm-start from the Q-table and protocol trained at the previous T_max
+            learner = Agent(n_steps, len(all_actions), qtable=previous.qtable)
+            learner._init_evironment(model, starting_action, all_actions)
+            learner.seed_protocol(previous.best_protocol)
+            # adaptive budget: start from a fraction of the episodes and double it until the previous fidelity is recovered
+            budget = max(int(episodes*cont_fraction), replay_freq+1)
+            spent = 0
+            while spent < episodes:
+                budget = min(budget, episodes-spent)
+                alpha = np.linspace(a, eta, budget)
+                _ = learner.train_agent(starting_action, budget, alpha, replay_freq, replay_episodes, verbose=False, epsilon_i=cont_epsilon)
+                spent += budget
+                if learner.best_reward >= previous.best_reward - cont_tol:
+                    break
+                budget *= 2
+        else:
+            # initialize the agent
+            learner = Agent(n_steps, len(all_actions))
+            learner._init_evironment(model, starting_action, all_actions)
+            # train
+            alpha = np.linspace(a, eta, episodes)
+            _ = learner.train_agent(starting_action, episodes, alpha, replay_freq, replay_episodes, verbose=False)
+            spent = episodes
+
+        total_episodes += spent
+        print("Found protocol with fidelity: {} in {} episodes".format(learner.best_reward, spent))
         fidelities.append([t_max, learner.best_reward])
-    
+        previous = learner
+
+    print("Total number of training episodes:", total_episodes)
     return fidelities
 
 
@@ -6,11 +6,13 @@
 '''
 
 #%%
-from profiler_decorator import profile
+from profiler_decorator import timed, section
 import numpy as np
 import copy
+from collections import OrderedDict
 
 
+@timed("hamiltonian")
 def compute_H_and_LA(L, g, field):
     
     '''
@@ -72,10 +74,11 @@ def compute_H_and_LA(L, g, field):
 
                 H2_temp = np.kron(sigma_z, np.identity(2**(L-j-1)))
                 H2+=np.kron(np.identity(2**(j)), H2_temp)
-                H = -(H1 + H2 + field*H3)
+                H = -(H1 + g*H2 + field*H3)
 
         #Compute and assign spectral quantities.
-        eigval, eigvect = LA.eigh(H)
+        with section("eigh"):
+            eigval, eigvect = LA.eigh(H)
         spectral_dict = {"H":H ,"eigval":eigval , "eigvect":eigvect}
         return spectral_dict
 
@@ -94,11 +97,14 @@ class quantum_model:
     dt: float, discrete timestep
     L: integer >0, number of Qubits
     g: float, static field along z-axis
-    h_list: list of float, list of all possible field values to precompute and store eigenvalues and eignvectors of the corresponding hamiltonians
+    h_list: list of float, list of field values whose eigenvalues and eignvectors are precomputed. Other field values are diagonalized
+            on first use (see spectral_cache)
     history: boolean, if True the each evolved quantum state is stored to recreate the path
+    spectral_size: integer, maximum number of decompositions kept in the spectral cache (at least len(h_list) are kept)
+    spectral_tol: float, field values closer than spectral_tol share the same decomposition
 
     '''
-    def __init__(self, qstart, qtarget, dt, L, g, h_list, history=True):
+    def __init__(self, qstart, qtarget, dt, L, g, h_list, history=True, spectral_size=64, spectral_tol=1e-9):
 
         self.qstart=qstart
         self.qtarget=qtarget
@@ -108,6 +114,15 @@ class quantum_model:
         self.L = L
         self.g = g
         self.h_list=h_list
+        self.spectral_size=max(spectral_size, len(h_list))
+        self.spectral_tol=spectral_tol
+
+        # Number of evolution steps performed (throughput metrics).
+        self.n_evolve = 0
+        # Diagonal observables, computed on first use (see diagonal_observables).
+        self.diagonals = None
+        # Whether the fidelity of time-reflected protocols can be computed from half the evolution (see reflection_symmetric).
+        self.reflection = None
 
         # Given self.h_list computes spectral quantities for each field value.
         self._init_hamiltonian() 
@@ -135,15 +150,16 @@ class quantum_model:
     def _init_hamiltonian(self):
         ''' 
 
-        Create dictionary of dictionaries. 
+        Create the spectral cache (see spectral_cache) and fill it with the field values in self.h_list.
         H_spectral_dict[field] contains a dictionary whose keys are "eigval", "eigvect" and "H" containing, infact, eigevalues, eigvectors of the
         hamiltonian H with that field value.
 
         '''
-        self.H_spectral_dict = {field : compute_H_and_LA(self.L, self.g, field) for field in self.h_list}
+        self.H_spectral_dict = spectral_cache(self.L, self.g, maxsize=self.spectral_size, tol=self.spectral_tol)
+        self.H_spectral_dict.prefetch(self.h_list)
 
-    # Profile the bottlenecks in evolve function. 
-    #@profile(sort_args=['name'], print_args=[25])
+    # Profile the bottlenecks in evolve function (see profiler_decorator). 
+    @timed("evolve")
     def evolve(self, field, check_norm=True):
         ''' 
 
@@ -156,16 +172,18 @@ class quantum_model:
 
         '''
 
-        eigvect = copy.deepcopy(self.H_spectral_dict[field]["eigvect"])
-        eigval = self.H_spectral_dict[field]["eigval"]
+        self.n_evolve += 1
+        spectral_dict = self.H_spectral_dict[field]
+        eigvect = spectral_dict["eigvect"]
+        eigval = spectral_dict["eigval"]
 
         # Compute a vector with entries coefficients for linear combination of eigenstates.
-        c = np.dot(np.conj(eigvect.transpose()), self.qcurrent)*np.exp((-1j*eigval*self.dt))
-        # Element-wise matrix multiplication, i.e. return a vector with at first element the product of the firsts elements, at the second one
-        # of the second ones and so on and so forth. 
-        eigvect = c*eigvect
-        # Compute the sum of the 2^{L} elements in order to get the evolved state. 
-        self.qcurrent = eigvect.sum(axis=1)
+        # (np.conj would copy the real eigenvectors of the real hamiltonian)
+        eigvect_dag = eigvect.transpose() if np.isrealobj(eigvect) else np.conj(eigvect.transpose())
+        c = _dot(eigvect_dag, self.qcurrent)*np.exp((-1j*eigval*self.dt))
+        # Linear combination of the eigenstates (columns of eigvect) with coefficients c, i.e. the evolved state. Only vectors of size 2^L
+        # are allocated.
+        self.qcurrent = _dot(eigvect, c)
 
         # Norm checking for the sake of debugging with adequate tolerance. 
         if check_norm and (np.abs(1 - compute_fidelity_ext(self.qcurrent,self.qcurrent)) > 1e-9):
@@ -175,6 +193,32 @@ class quantum_model:
             self.qstates_history.append(self.qcurrent)
 
 
+    def load_state(self, qstate):
+        ''' 
+
+        Sets self.qcurrent to an already evolved state (e.g. taken from a prefix_cache) as if it was obtained with evolve.
+        
+        INPUTS:
+        qstate: np.array(dtype=complex) of size 2^L, the quantum state
+
+        '''
+        self.qcurrent = qstate
+        if self.history:
+            self.qstates_history.append(self.qcurrent)
+
+
+    def propagator(self, field):
+        ''' 
+
+        Returns the propagator exp(-iH(h)dt) of the field value (from its spectral decomposition in H_spectral_dict) as a 2^L x 2^L matrix
+
+        '''
+        spectral_dict = self.H_spectral_dict[field]
+        eigvect = spectral_dict["eigvect"]
+        return (eigvect*np.exp(-1j*spectral_dict["eigval"]*self.dt)) @ np.conj(eigvect.T)
+
+
+    @timed("fidelity")
     def compute_fidelity(self):
         ''' 
 
@@ -185,13 +229,75 @@ class quantum_model:
         return np.copy(self.fidelity)
 
 
-    def evolve_from_protocol(self, protocol):
+    def reflection_symmetric(self, tol=1e-9):
+        ''' 
+
+        Checks whether the fidelity of a time-reflected protocol (h_1..h_n, -h_n..-h_1, see reflect_protocol) can be computed after evolving
+        only its first half (see compute_reflected_fidelity). Since the hamiltonian is real, U(h)^T = U(h), and since P U(h) P = U(-h)
+        (see spin_flip_parity) the second half is P A^T P, with A the evolution of the first half. If P qtarget = c qstart and qstart is real
+        up to a phase, the overlap is c* (A qstart)^T P (A qstart) (up to a phase).
+
+        '''
+        if self.reflection is None:
+            parity = spin_flip_parity(self.L)
+            self.reflection = bool(np.abs(np.abs(np.vdot(self.qstart, parity*self.qtarget)) - 1) < tol and
+                                   np.abs(np.abs(np.dot(self.qstart, self.qstart)) - 1) < tol)
+        return self.reflection
+
+
+    @timed("fidelity")
+    def compute_reflected_fidelity(self):
+        ''' 
+
+        The function computes the fidelity with self.qtarget reached by the time-reflected protocol whose first half led from self.qstart to
+        self.qcurrent (valid only if reflection_symmetric() is True)
+
+        '''
+        self.fidelity = np.abs(np.dot(self.qcurrent, spin_flip_parity(self.L)*self.qcurrent))**2
+        return np.copy(self.fidelity)
+
+
+    def diagonal_observables(self):
+        ''' 
+
+        Computes (once per model) the diagonals in the computational basis of the diagonal observables used by observable_functions:
+            diagonals["sigma_z"]: 2^L numpy array, magnetisation per site sum_j sigma^z_j / L (Pauli matrices)
+            diagonals["H0"]: 2^L numpy array, the field independent part of the hamiltonian (the control term sigma^x is off-diagonal,
+                             so it is the diagonal of any H in H_spectral_dict)
+
+        '''
+        if self.diagonals is None:
+            n_down = np.zeros(2**self.L)
+            for j in range(self.L):
+                n_down += (np.arange(2**self.L) >> j) & 1
+            H = self.H_spectral_dict[self.h_list[0] if len(self.h_list) > 0 else 0]["H"]
+            self.diagonals = {"sigma_z": 1 - 2*n_down/self.L, "H0": np.real(np.diag(H)).copy()}
+        return self.diagonals
+
+
+    def evolve_from_protocol(self, protocol, observables=None, every=1):
         ''' 
 
         The function for each value of the magnetic field h^x in the protocol computes the entire evolution 
         of the state after the application of the entire protocol.
-        
+        If observables are given the states are not stored: the observables are computed as the states are produced and only
+        their values are returned, so that the memory needed is O(2^L).
+
+        INPUTS:
+        protocol: list or np.array of field values
+        observables: (optional) list of names in observable_functions or of couples (name, function), where function(model, qstate, field)
+                     returns a float
+        every: integer, the observables are computed every "every" steps (the initial and final states are always included)
+
+        OUTPUTS:
+        qstates_history: np.array of size [nsteps+1, 2^L], the visited states (if observables is None)
+        values: dictionary of np.arrays, values[name] are the values of the observable, values["step"] the corresponding steps (if observables
+                are given)
+
         '''
+        if observables is not None:
+            return self._evolve_observables(protocol, observables, every)
+
         #if history was set to false it is necessary to reset it to true. history_bool keeps track of this change and is used to reset it as it was 
         #at the end of the evolution.
         history_bool = np.copy(self.history)
@@ -204,6 +310,438 @@ class quantum_model:
         self.history=history_bool
         return np.copy(self.qstates_history)
 
+
+    def _evolve_observables(self, protocol, observables, every):
+        ''' 
+
+        Evolution along the protocol computing the observables on the fly (see evolve_from_protocol)
+
+        '''
+        functions = []
+        for obs in observables:
+            if isinstance(obs, str):
+                functions.append((obs, observable_functions[obs]))
+            else:
+                functions.append(obs)
+
+        nsteps = len(protocol)
+        steps = np.arange(0, nsteps+1, every)
+        if steps[-1] != nsteps:
+            steps = np.append(steps, nsteps)
+        values = {"step": steps}
+        for name, _ in functions:
+            values[name] = np.zeros(len(steps))
+
+        history_bool = self.history
+        self.history = False
+        n = 0
+        for step in range(nsteps+1):
+            if step > 0:
+                self.evolve(protocol[step-1])
+            if step == steps[n]:
+                # The energy at step 0 is computed with the first field of the protocol.
+                field = protocol[max(step-1, 0)] if nsteps > 0 else 0
+                for name, function in functions:
+                    values[name][n] = function(self, self.qcurrent, field)
+                n += 1
+        self.history = history_bool
+        return values
+
+
+    def protocol_fidelities(self, protocols):
+        ''' 
+
+        Fidelities reached from self.qstart by many protocols at once. The states of all the protocols are the columns of a 2^L x n_protocols
+        matrix: at each step the protocols applying the same field value are evolved together with one matrix product by its propagator
+        (see propagator). self.qcurrent is not modified.
+
+        INPUTS:
+        protocols: np.array of size [n_protocols, nsteps], field values
+
+        OUTPUTS:
+        fidelities: np.array of size n_protocols
+
+        '''
+        protocols = np.atleast_2d(np.asarray(protocols, dtype=float))
+        n_protocols, nsteps = protocols.shape
+        fields, index = np.unique(protocols, return_inverse=True)
+        index = index.reshape(protocols.shape)
+        U = [self.propagator(field) for field in fields]
+
+        states = np.tile(np.asarray(self.qstart, dtype=complex)[:,None], (1, n_protocols))
+        for step in range(nsteps):
+            if len(fields) == 1:
+                states = U[0] @ states
+                continue
+            for k in range(len(fields)):
+                columns = np.nonzero(index[:,step] == k)[0]
+                if len(columns) == n_protocols:
+                    states = U[k] @ states
+                elif len(columns) > 0:
+                    states[:,columns] = U[k] @ states[:,columns]
+        self.n_evolve += protocols.size
+        return np.abs(np.conj(self.qtarget) @ states)**2
+
+
+def _dot(matrix, vector):
+    '''
+    Matrix-vector product. A real matrix is not cast to complex (which would allocate a 2^L x 2^L complex copy at each call).
+    '''
+    if np.isrealobj(matrix) and np.iscomplexobj(vector):
+        return np.dot(matrix, vector.real) + 1j*np.dot(matrix, vector.imag)
+    return np.dot(matrix, vector)
+
+
+def _fidelity_observable(model, qstate, field):
+    return np.abs(np.vdot(model.qtarget, qstate))**2
+
+
+def _sigma_x_observable(model, qstate, field):
+    # sigma^x_j flips the j-th spin, i.e. reverses the corresponding axis of the state seen as a tensor with L indices.
+    psi = qstate.reshape((2,)*model.L)
+    return sum(np.real(np.vdot(psi, np.flip(psi, axis=j))) for j in range(model.L))/model.L
+
+
+def _sigma_z_observable(model, qstate, field):
+    return np.dot(model.diagonal_observables()["sigma_z"], np.abs(qstate)**2)
+
+
+def _energy_observable(model, qstate, field):
+    # H(h) = H0 - h/2 sum_j sigma^x_j with H0 diagonal.
+    energy = np.dot(model.diagonal_observables()["H0"], np.abs(qstate)**2)
+    return energy - field*model.L/2*_sigma_x_observable(model, qstate, field)
+
+
+def _entropy_observable(model, qstate, field):
+    # Von Neumann entropy of the first L//2 qubits from the Schmidt coefficients.
+    schmidt = np.linalg.svd(qstate.reshape(2**(model.L//2), -1), compute_uv=False)**2
+    schmidt = schmidt[schmidt > 1e-15]
+    return np.abs(np.sum(schmidt*np.log(schmidt)))
+
+
+# Observables available by name in quantum_model.evolve_from_protocol (new ones can be added as name: function(model, qstate, field)).
+observable_functions = {
+    "fidelity": _fidelity_observable,
+    "energy": _energy_observable,
+    "sigma_x": _sigma_x_observable,
+    "sigma_z": _sigma_z_observable,
+    "entropy": _entropy_observable,
+    }
+
+
+class spectral_cache:
+    '''
+
+    Bounded LRU cache of the spectral decompositions (see compute_H_and_LA) of the hamiltonians of a model, computed on first use.
+    Field values are quantised to multiples of tol, so that e.g. 4 and 4.0 (or 4+1e-12) share the same decomposition (the one
+    computed for the first value used).
+    When more than maxsize decompositions are stored the least recently used one is removed.
+    It is indexed like a dictionary: cache[field] returns the spectral dictionary of H(field).
+
+    INITIALIZATION VARIABLES:
+    L: integer > 0, number of qubits in the system
+    g: float, static field along z-axis
+    maxsize: integer, maximum number of stored decompositions
+    tol: float, quantisation step of the field values
+
+    '''
+    def __init__(self, L, g, maxsize=64, tol=1e-9):
+        self.L = L
+        self.g = g
+        self.maxsize = maxsize
+        self.tol = tol
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.cache = OrderedDict()
+
+
+    def key(self, field):
+        '''
+
+        Quantised key of a field value
+
+        '''
+        return int(round(float(field)/self.tol))
+
+
+    def __getitem__(self, field):
+        key = self.key(field)
+        spectral_dict = self.cache.get(key)
+        if spectral_dict is None:
+            self.misses += 1
+            spectral_dict = compute_H_and_LA(self.L, self.g, field)
+            self.cache[key] = spectral_dict
+            if len(self.cache) > self.maxsize:
+                self.cache.popitem(last=False)
+                self.evictions += 1
+        else:
+            self.hits += 1
+            self.cache.move_to_end(key)
+        return spectral_dict
+
+
+    def prefetch(self, fields):
+        '''
+
+        Computes in advance the decompositions of the given field values
+
+        '''
+        for field in fields:
+            if field not in self:
+                self[field]
+
+
+    def __contains__(self, field):
+        return self.key(field) in self.cache
+
+
+    def __len__(self):
+        return len(self.cache)
+
+
+    def clear(self):
+        '''
+
+        Removes all the stored decompositions
+
+        '''
+        self.cache.clear()
+
+
+    @property
+    def nbytes(self):
+        '''
+
+        Memory (in bytes) used by the stored hamiltonians, eigenvalues and eigenvectors
+
+        '''
+        return sum(array.nbytes for spectral_dict in self.cache.values() for array in spectral_dict.values())
+
+
+    def stats(self):
+        '''
+
+        OUTPUTS:
+        stats: dictionary with number of stored decompositions, hits, misses, evictions and memory (in bytes)
+
+        '''
+        return {"size": len(self.cache), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions, "nbytes": self.nbytes}
+
+
+class _trie_node(object):
+    '''
+    Node of prefix_cache: the state obtained after the actions on the path from the root.
+    '''
+    __slots__ = ('state', 'children', 'parent', 'key')
+
+    def __init__(self, state, parent, key):
+        self.state = state
+        self.children = {}
+        self.parent = parent
+        self.key = key
+
+
+class prefix_cache:
+    '''
+
+    Bounded trie of evolved quantum states indexed by the prefix of field values applied from qstart.
+    Episodes sharing a prefix with a previous one jump to the deepest cached state and only evolve the divergent suffix.
+    When max_nodes is exceeded the least recently used node is removed together with its subtree. Since every episode refreshes
+    its path from the leaf up to the root, the least recently used node is always a leaf of the trie.
+    The cache is cleared whenever it is used with a different model or starting state.
+
+    INITIALIZATION VARIABLES:
+    max_nodes: integer, maximum number of cached states (it should be larger than the number of steps of an episode)
+
+    '''
+    def __init__(self, max_nodes=100000):
+        self.max_nodes = max_nodes
+        self.hits = 0
+        self.misses = 0
+        self.clear()
+
+
+    def clear(self):
+        '''
+
+        Removes all the cached states
+
+        '''
+        self.root = _trie_node(None, None, None)
+        self.lru = OrderedDict()
+        self.model = None
+        self.qstart = None
+        self.path = []
+        self.node = self.root
+
+
+    def reset(self, model):
+        '''
+
+        Moves back to the root of the trie, to be called together with model.reset() at the beginning of each episode
+
+        INPUTS:
+        model: quantum_model object whose evolution is cached
+
+        '''
+        if model is not self.model or model.qstart is not self.qstart:
+            self.clear()
+            self.model = model
+            self.qstart = model.qstart
+
+        # Refresh the last path from the leaf to the root so that ancestors are always more recent than their descendants.
+        for node in reversed(self.path):
+            if node in self.lru:
+                self.lru.move_to_end(node)
+        self.path.clear()
+        self.node = self.root
+
+
+    def evolve(self, model, field):
+        '''
+
+        Same as model.evolve(field), but the evolved state is taken from the cache when the current prefix was already simulated
+
+        INPUTS:
+        model: quantum_model object (the same passed to reset)
+        field: float, instanteneous value of the control field h^x
+
+        '''
+        child = self.node.children.get(field)
+        if child is None:
+            self.misses += 1
+            model.evolve(field)
+            child = _trie_node(model.qcurrent, self.node, field)
+            self.node.children[field] = child
+            self.lru[child] = None
+            if len(self.lru) > self.max_nodes:
+                self._evict()
+        else:
+            self.hits += 1
+            model.load_state(child.state)
+            self.lru.move_to_end(child)
+        self.path.append(child)
+        self.node = child
+
+
+    def _evict(self):
+        '''
+
+        Removes the least recently used node and its subtree
+
+        '''
+        node, _ = self.lru.popitem(last=False)
+        del node.parent.children[node.key]
+        stack = list(node.children.values())
+        while stack:
+            child = stack.pop()
+            self.lru.pop(child, None)
+            stack.extend(child.children.values())
+
+
+class propagator_tree:
+    '''
+
+    Segment tree of the propagators of a protocol: the leaves are the propagators of the steps (padded with identities up to a power of 2) and
+    each internal node is the product over its time interval (later steps on the left), so that the root is the evolution of the whole protocol.
+    Changing k steps only updates the k paths from the leaves to the root, i.e. O(k log nsteps) matrix products instead of a whole evolution.
+    Changes are first evaluated with trial (the tree is not modified) and then made permanent with commit.
+    Meant for small L, since the nodes are 2^L x 2^L matrices.
+
+    INITIALIZATION VARIABLES:
+    model: quantum_model object, provides the propagators (see quantum_model.propagator), qstart and qtarget
+    protocol: np.array of size nsteps, field values
+
+    '''
+    def __init__(self, model, protocol):
+        self.model = model
+        self.propagators = {}
+        self.n_products = 0
+        self.build(protocol)
+
+
+    def propagator(self, field):
+        U = self.propagators.get(field)
+        if U is None:
+            U = self.model.propagator(field)
+            self.propagators[field] = U
+        return U
+
+
+    def build(self, protocol):
+        '''
+
+        Builds the tree of a new protocol (one level of nodes at a time)
+
+        '''
+        self.protocol = np.array(protocol, dtype=float)
+        self.size = 1
+        while self.size < len(self.protocol):
+            self.size *= 2
+        dim = len(self.model.qstart)
+        self.tree = np.empty((2*self.size, dim, dim), dtype=complex)
+        self.tree[self.size:] = np.eye(dim)
+        for i, field in enumerate(self.protocol):
+            self.tree[self.size + i] = self.propagator(field)
+        first = self.size//2
+        while first >= 1:
+            self.tree[first:2*first] = self.tree[2*first+1:4*first:2] @ self.tree[2*first:4*first:2]
+            self.n_products += first
+            first //= 2
+        self.pending = None
+
+
+    def fidelity(self, root=None):
+        '''
+
+        Fidelity with qtarget reached from qstart by the protocol of the tree (or by the evolution root)
+
+        '''
+        if root is None:
+            root = self.tree[1]
+        return np.abs(np.vdot(self.model.qtarget, root @ self.model.qstart))**2
+
+
+    def trial(self, indices, fields):
+        '''
+
+        Fidelity of the protocol with the steps in indices set to fields. The updated nodes are kept until commit (or the next trial).
+
+        INPUTS:
+        indices: integer or list of integers, steps to change
+        fields: float or list of floats, new field values of the steps
+
+        '''
+        indices = np.atleast_1d(indices)
+        fields = np.broadcast_to(np.asarray(fields, dtype=float), indices.shape)
+        nodes = {self.size + i: self.propagator(field) for i, field in zip(indices, fields)}
+        level = set(nodes)
+        while 1 not in nodes:
+            level = {node//2 for node in level}
+            for parent in level:
+                left = nodes.get(2*parent, self.tree[2*parent])
+                right = nodes.get(2*parent+1, self.tree[2*parent+1])
+                nodes[parent] = right @ left
+            self.n_products += len(level)
+        self.pending = (indices, fields, nodes)
+        return self.fidelity(nodes[1])
+
+
+    def commit(self):
+        '''
+
+        Makes the changes of the last trial permanent
+
+        '''
+        indices, fields, nodes = self.pending
+        for node, U in nodes.items():
+            self.tree[node] = U
+        self.protocol[indices] = fields
+        self.pending = None
+
+
 def compute_fidelity_ext(qtarget, qcurrent):
     ''' 
 
@@ -247,6 +785,41 @@ def ground_state(L, field, g=1):
     except ValueError:
         print("WARNING: number of Qubits L must be positive and not 0")
 
+
+def reflect_protocol(protocol):
+    '''
+
+    Time-reflected protocol h(t) -> -h(T-t): the given first half followed by its reversed and flipped copy.
+
+    INPUTS:
+    protocol: np.array(), size nsteps/2, the first half of the protocol
+
+    OUTPUTS:
+    protocol: np.array(), size nsteps, the whole protocol
+
+    '''
+    protocol = np.asarray(protocol)
+    return np.concatenate([protocol, -protocol[::-1]])
+
+
+def spin_flip_parity(L):
+    '''
+
+    Diagonal of the parity operator P = sigma_z x ... x sigma_z (Pauli matrices) in the computational basis. P anticommutes with the control
+    term of the hamiltonian and commutes with the others, therefore P H(h) P = H(-h) and P exp(-iH(h)dt) P = exp(-iH(-h)dt).
+
+    INPUTS:
+    L: integer > 0, number of qubts in the system
+
+    OUTPUTS:
+    parity: np.array(), size 2^L, entries (-1)^(number of down spins) of the basis states
+
+    '''
+    n_down = np.zeros(2**L, dtype=int)
+    for j in range(L):
+        n_down += (np.arange(2**L) >> j) & 1
+    return 1 - 2*(n_down % 2)
+
         
 
 # Simple main of tasting with the cration of a gif for the sake of visualization.     
@@ -8,13 +8,14 @@
 
 import numpy as np
 from pathlib import Path
-import matplotlib.pyplot as plt
 import argparse
+import json
 #import sys
 
-from Qmodel import quantum_model, ground_state
-from QctRL import Agent
-from gif import create_gif
+from Qmodel import ground_state, reflect_protocol
+from su2 import make_model
+from QctRL import Agent, downsample_log
+import profiler_decorator
 
 ########################
 ## PARAMETERS ##########
@@ -23,25 +24,67 @@ parser = argparse.ArgumentParser(prog = '\nTrain RL Agent to find optimal protoc
                             description = 'The program runs training of the RL Agent over the quantum system and outputs useful visualization plot of the performace.\nIf L=1 the program can produce a gif of the protocol representation on the Bloch sphere.')
 
 parser.add_argument('--t_max', type=float, nargs='?', default=2.5, help='Total protocol time')
+parser.add_argument('--profile', type=str, nargs='?', const='', default=None, help='Accumulate timings of the instrumented sections and print them at exit (or save them to the given .json file)')
 parser.add_argument('--nsteps', type=int, nargs='?', default=100, help='Number of timesteps in the protocol')
 parser.add_argument('--L', type=int, nargs='?', default=1, help='Number of qubits to consider')
 parser.add_argument('--g', type=int, nargs='?', default=1, help='Static field value')
 parser.add_argument("--actions", type=int, nargs="+", default=[-4, 4], help='List of possible magnetic field values')
 parser.add_argument("--starting_action", type=int, nargs="?", default=0, help='Starting action index')
 parser.add_argument('--episodes', type=int, nargs='?', default=20001, help='Total number of episodes')
+parser.add_argument('--alpha_i', type=float, nargs='?', default=0.9, help='Initial learning rate (linearly decreased to alpha_f during the training)')
+parser.add_argument('--alpha_f', type=float, nargs='?', default=0.89, help='Final learning rate')
+parser.add_argument('--lmbda', type=float, nargs='?', default=0.8, help='Lambda parameter of the eligibility trace')
+parser.add_argument('--decay_steps', type=int, nargs='?', default=10, help='Tolerated number of epsilon updates without improvement of the average reward (see Agent.update_greedyness)')
+parser.add_argument('--decay_temperature', type=float, nargs='?', default=8, help='Temperature factor of the exponential epsilon decay (see Agent.update_greedyness)')
 parser.add_argument('--replay_freq', type=int, nargs='?', default=50, help='Number of episodes to run between each replay session')
 parser.add_argument('--replay_episodes', type=int, nargs='?', default=40, help='Number of replay episodes')
+parser.add_argument('--early_stop', type=int, nargs='?', default=None, help='Window (in episodes) of the convergence-based early stopping. If not given all episodes are run')
+parser.add_argument('--stop_tol', type=float, nargs='?', default=1e-3, help='Tolerance of the convergence-based early stopping signals')
+parser.add_argument('--checkpoint_freq', type=int, nargs='?', default=1000, help='Number of episodes between two training checkpoints (0 disables checkpointing)')
+parser.add_argument('--resume', action='store_true', help='Resume the training from the last checkpoint in out_dir')
+parser.add_argument('--plot_bins', type=int, nargs='?', default=2000, help='Number of points of the downsampled training curves in the plot')
+parser.add_argument('--cache_size', type=int, nargs='?', default=0, help='Maximum number of quantum states kept in the protocol prefix cache (0 disables the cache)')
+parser.add_argument('--symmetric', action='store_true', help='Search only time-reflected protocols h(t) = -h(T-t): the agent chooses the first nsteps/2 steps')
+parser.add_argument('--workers', type=int, nargs='?', default=0, help='Number of actor processes simulating the episodes for a central learner (see actor_learner.py). 0 trains in a single process')
+parser.add_argument('--sync_freq', type=int, nargs='?', default=10, help='Number of episodes between two broadcasts of the Q-table to the actors')
 parser.add_argument('--out_dir', type=str, nargs='?', default='results', help='Output directory')
+parser.add_argument('--no-plot', dest='no_plot', action='store_true', help='Headless mode: skip the training plot (matplotlib is not imported)')
 parser.add_argument('--gif', type=bool, nargs='?', default=False, help='Set equal to True if given L=1 a .gif animation of the protocol on the Bloch sphere is desired.')
 
 ########################
 ########################
 ########################
 
+def plot_training(args, out_dir, rewards, avg_rewards, epsilons):
+    '''
+    Plots the (downsampled) rewards, average rewards and epsilons of the training and saves the figure in out_dir
+    '''
+    import matplotlib.pyplot as plt
+
+    episodes_r, rewards_mean, _, _ = downsample_log(rewards, args.plot_bins)
+    episodes_e, epsilons_mean, _, _ = downsample_log(epsilons[1:], args.plot_bins)
+    episodes_a, avg_rewards_mean, _, _ = downsample_log(avg_rewards[1:], args.plot_bins)
+
+    fname = 'train_result_'+str(args.L)+'_'+str(args.t_max)+'.png'
+    fname = out_dir / fname
+    plt.close('all')
+    fig = plt.figure(figsize=(10,6))
+    plt.scatter(episodes_r, rewards_mean, marker = '.', alpha=0.8)
+    plt.scatter(episodes_e, epsilons_mean, marker = '.', alpha=0.3)
+    plt.scatter(episodes_a, avg_rewards_mean, marker = '.', alpha=0.8)
+    plt.xlabel('Episode number', fontsize=14)
+    plt.ylabel('Fidelity', fontsize=14)
+    plt.savefig(fname)
+    plt.show()
+    plt.close(fig=fig)
+
+
 if __name__ == "__main__":
 
     ### Parse input arguments
     args = parser.parse_args()
+    if args.profile is not None:
+        profiler_decorator.enable(out=args.profile or None)
 
     print("Running training with parameters:\n", args)
 
@@ -50,51 +93,77 @@ if __name__ == "__main__":
     out_dir.mkdir(parents=True, exist_ok=True)
 
     dt = args.t_max/args.nsteps
+    if args.symmetric and (args.nsteps%2 != 0 or len(args.actions) != 2 or args.actions[0] != -args.actions[1]):
+        print("WARNING ----> Symmetric protocols need an even number of steps and actions -h h: searching all protocols")
+        args.symmetric = False
+    if args.workers > 0 and (args.early_stop is not None or args.resume):
+        parser.error("--early_stop and --resume are not supported with --workers (actor-learner mode)")
+    if args.workers > 0 and args.checkpoint_freq > 0:
+        print("WARNING ----> Checkpoints are not written with --workers (actor-learner mode)")
 
     ####### MODEL INIT #######
     # Define target and starting state
     qstart = ground_state(args.L, -2)
     qtarget = ground_state(args.L, +2)
-    model = quantum_model(qstart, qtarget, dt, args.L, args.g, args.actions)
+    model = make_model(qstart, qtarget, dt, args.L, args.g, args.actions)
 
     # alpha value
-    a=0.9
-    eta=0.89
-    alpha = np.linspace(a, eta, args.episodes)
+    alpha = np.linspace(args.alpha_i, args.alpha_f, args.episodes)
     
     # initialize the agent
-    learner = Agent(args.nsteps, len(args.actions))
+    # in symmetric mode the agent decides only the first half of the protocol
+    decision_steps = args.nsteps//2 if args.symmetric else args.nsteps
+    learner = Agent(decision_steps, len(args.actions), cache_size=args.cache_size, symmetric=args.symmetric, decay_steps=args.decay_steps,
+                    decay_temperature=args.decay_temperature, **{'lambda': args.lmbda})
     learner._init_evironment(model, args.starting_action, args.actions)
+    # checkpoint
+    checkpoint = None
+    if args.checkpoint_freq > 0:
+        checkpoint = out_dir / ('checkpoint_'+str(args.L)+'_'+str(args.t_max)+'.npz')
+    # training logs (rewards, average rewards and epsilons) are streamed to a binary .npy file
+    fname = 'train_result_'+str(args.L)+'_'+str(args.t_max)+'.npy'
+    log_file = out_dir / fname
     # train
-    rewards, avg_rewards, epsilons = learner.train_agent(args.starting_action, args.episodes, alpha, args.replay_freq, args.replay_episodes, verbose=False)
+    if args.workers > 0:
+        # actor-learner mode (no early stopping and checkpoints)
+        from actor_learner import train_actor_learner
+        rewards, avg_rewards, epsilons = train_actor_learner(learner, args.starting_action, args.episodes, alpha, args.replay_freq, args.replay_episodes,
+                                                             workers=args.workers, sync_freq=args.sync_freq)
+        np.save(log_file, np.array([rewards, avg_rewards, epsilons]))
+    else:
+        rewards, avg_rewards, epsilons = learner.train_agent(args.starting_action, args.episodes, alpha, args.replay_freq, args.replay_episodes, verbose=False,
+                                                         early_stop=args.early_stop, stop_tol=args.stop_tol,
+                                                         checkpoint=checkpoint, checkpoint_freq=max(args.checkpoint_freq, 1), resume=args.resume,
+                                                         log_file=log_file)
 
     #### VARIOUS VISUALIZATION TASKS ####
     print("Best protocol Reward: {}".format(learner.best_reward))
+    if learner.stop_reason is not None:
+        print("Training stopped after {} episodes: {}".format(learner.stop_episode, learner.stop_reason))
+    print("Episodes per second: {:.1f}".format(learner.stats["episodes_per_second"]))
     #sys.stdout.close()
 
-    # save protocol
-    fname = 'train_result_'+str(args.L)+'_'+str(args.t_max)+'.txt'
-    fname = out_dir / fname
-    data = [rewards, avg_rewards, epsilons]
-    np.savetxt(fname, data, delimiter = ',')
+    # save throughput metrics
+    fname = 'train_stats_'+str(args.L)+'_'+str(args.t_max)+'.json'
+    with open(out_dir / fname, 'w') as f:
+        json.dump(learner.stats, f, indent=2)
 
-    # plot reward results
-    total_episodes=args.episodes+np.floor(args.episodes/args.replay_freq)*args.replay_episodes
+    # save the best protocol (e.g. for robustness.py)
+    best_protocol = reflect_protocol(learner.best_protocol) if args.symmetric else learner.best_protocol
+    fname = 'best_protocol_'+str(args.L)+'_'+str(args.t_max)+'.npy'
+    np.save(out_dir / fname, best_protocol)
 
-    fname = 'train_result_'+str(args.L)+'_'+str(args.t_max)+'.png'
-    fname = out_dir / fname
-    plt.close('all')
-    fig = plt.figure(figsize=(10,6))
-    plt.scatter(np.arange(0,total_episodes+1,1), rewards, marker = '.', alpha=0.8)
-    plt.scatter(np.arange(0,total_episodes,1), epsilons[1:], marker = '.', alpha=0.3)
-    plt.scatter(np.arange(0,total_episodes,1), avg_rewards[1:], marker = '.', alpha=0.8)
-    plt.xlabel('Episode number', fontsize=14)
-    plt.ylabel('Fidelity', fontsize=14)
-    plt.savefig(fname)
-    plt.show()
-    plt.close(fig=fig)
+    # plot reward results (downsampled)
+    if not args.no_plot:
+        plot_training(args, out_dir, rewards, avg_rewards, epsilons)
  
     if args.gif==True and args.L==1:
+        from gif import create_gif
         fname = 'protocol'+str(args.t_max)+'-'+str(dt)+'.gif'
         fname = out_dir / fname
-        create_gif(learner.best_path, qstart, qtarget, fname)
+        best_path = learner.best_path
+        if args.symmetric:
+            # path of the whole time-reflected protocol
+            model.reset()
+            best_path = model.evolve_from_protocol(reflect_protocol(learner.best_protocol))
+        create_gif(best_path, qstart, qtarget, fname)
@@ -5,13 +5,13 @@
         Methods and class to instantiate and manipulate both single qubits and many-quntum body pure and separable systems.
 '''
 
-from Qmodel import quantum_model, compute_fidelity_ext
+from Qmodel import reflect_protocol, propagator_tree
+from su2 import su2_model, make_model
 import numpy as np
 from random import choices
-from random import uniform
-from tqdm import tnrange
 from itertools import combinations
 from copy import deepcopy
+import time
 
 def correlation(matrix,h):
     '''
@@ -40,7 +40,45 @@ def correlation(matrix,h):
 
 
 
-def stochastic_descent(qstart, qtarget, L, T, nsteps, nflip, field_list):
+def _evolve_protocol(model, protocol):
+    '''
+    Evolves the model with the protocol: single qubit models compose the whole protocol in closed form (see su2_model.apply_protocol)
+    '''
+    if isinstance(model, su2_model):
+        model.apply_protocol(protocol)
+    else:
+        model.evolve_from_protocol(protocol)
+
+
+def _protocol_fidelity(model, protocol, symmetric):
+    '''
+    Evolves the model (already reset) with the protocol and returns the fidelity. If symmetric the protocol is the first half of a time-reflected
+    protocol (see Qmodel.reflect_protocol): only the first half is evolved when the model allows it (see quantum_model.reflection_symmetric).
+    '''
+    if symmetric and model.reflection_symmetric():
+        _evolve_protocol(model, protocol)
+        return model.compute_reflected_fidelity()
+    if symmetric:
+        protocol = reflect_protocol(protocol)
+    _evolve_protocol(model, protocol)
+    return model.compute_fidelity()
+
+
+def _tree_update(index_update, temp_protocol, nsteps, symmetric):
+    '''
+    Steps of the whole protocol (and their new values) changed by a move on the indices index_update (for a symmetric protocol also the
+    mirrored steps change)
+    '''
+    indices = np.atleast_1d(index_update)
+    fields = temp_protocol[indices]
+    if symmetric:
+        indices = np.concatenate([indices, nsteps - 1 - indices])
+        fields = np.concatenate([fields, -fields])
+    return indices, fields
+
+
+def stochastic_descent(qstart, qtarget, L, T, nsteps, nflip, field_list, return_stats=False, initial_protocol=None, symmetric=False,
+                       segment_tree=None):
     
     ''' 
     The function performs stochastic descent for a system of dimension L from an initial state qstart to reach the final state qtarget
@@ -56,23 +94,42 @@ def stochastic_descent(qstart, qtarget, L, T, nsteps, nflip, field_list):
     nsteps: integer, steps in the protocol
     nflip: integer, maximum number of flips at a time
     field_list: list of float, list of all possible field values to precompute and store eigenvalues and eignvectors of the corresponding hamiltonians
+    return_stats: boolean, if True a dictionary of throughput metrics is returned as third output
+    initial_protocol: (optional) np.array() of size nsteps, protocol the descent starts from (warm start) instead of a random one. In this case
+                      only flips improving its fidelity are accepted
+    symmetric: boolean, if True only time-reflected protocols h(t) = -h(T-t) are searched (nsteps must be even and field_list = [-h, h]):
+               the descent flips the first half of the protocol (i.e. mirrored pairs of steps)
+    segment_tree: boolean, if True the moves are evaluated with a propagator_tree (O(nflip log nsteps) matrix products per move instead of a
+                  whole evolution). By default it is used for nflip > 1 and 2 <= L <= 5 (single qubit models already compose the protocol in
+                  closed form, see su2.su2_model)
 
 
     OUTPUTS:
     random_protocol: np.array() of size nsteps, protocol corresponding to the best achieved fidelity
     fidelity_values: list, log of updates in fidelity during the descent
+    stats: (only if return_stats) dictionary with the number of fidelity evaluations, evolution steps, matrix products (of the segment tree),
+           accepted moves, sweeps over the flip list, restarts (from a new random protocol), the time spent in setup and descent and the
+           evaluations per second
 
     '''
+    start_time = time.perf_counter()
+    stats = {"evaluations": 0, "evolve_calls": 0, "accepted": 0, "sweeps": 0, "restarts": 0}
 
     # dt of the evolution for each element value of the protocol.  
     dt = T/nsteps
     
-    # Initialize model.
-    model=quantum_model(qstart, qtarget, dt, L, g=1, h_list=field_list, history=True)
+    # Initialize model (closed-form evolution for a single qubit).
+    model=make_model(qstart, qtarget, dt, L, g=1, h_list=field_list, history=True)
+
+    if symmetric and (nsteps%2 != 0 or len(field_list) != 2 or field_list[0] != -field_list[1]):
+        print("WARNING ----> Symmetric protocols need an even number of steps and field_list = [-h, h]: searching all protocols")
+        symmetric = False
+    # Number of free steps of the protocol (the second half of a symmetric protocol is fixed by the first one).
+    nfree = nsteps//2 if symmetric else nsteps
 
     np.random.seed(213)
     # Define a random protocol, sampling from a list. 
-    random_protocol = np.array(choices(field_list, k=nsteps)) 
+    random_protocol = np.array(choices(field_list, k=nfree)) 
     # Make a copy with the appropriate function s.t. a future change in temp_protocol does not effect random_protocol.
     temp_protocol=deepcopy(random_protocol)
 
@@ -81,10 +138,22 @@ def stochastic_descent(qstart, qtarget, L, T, nsteps, nflip, field_list):
     fidelity = deepcopy(start_fidelity)
     fidelity_values=[start_fidelity]
 
+    if initial_protocol is not None:
+        random_protocol = np.array(initial_protocol, dtype=float)[:nfree]
+        fidelity = _protocol_fidelity(model, random_protocol, symmetric)
+        fidelity_values = [fidelity]
+        stats["evaluations"] += 1
+
+    if segment_tree is None:
+        segment_tree = nflip > 1 and 2 <= L <= 5
+    tree = None
+    if segment_tree:
+        tree = propagator_tree(model, reflect_protocol(random_protocol) if symmetric else random_protocol)
 
-    flip_list = [i for i in range(nsteps)]
+
+    flip_list = [i for i in range(nfree)]
     # List with index of protocol array. 
-    index = np.arange(0,nsteps,1)
+    index = np.arange(0,nfree,1)
     # If we perform more than a flip at each iteration, in the flip_list beyond the element corresponding to the single index of the protocol array
     # all the combinations possible for the given number nflip of the indices and for lower combinations up to one are created. 
     for s in range(1, nflip):
@@ -96,9 +165,11 @@ def stochastic_descent(qstart, qtarget, L, T, nsteps, nflip, field_list):
     
     # Boolean variable to stop the while.
     minima = False
+    stats["time_setup"] = time.perf_counter() - start_time
 
     while not minima:
 
+        stats["sweeps"] += 1
         # Randomly shuffle the array with the indices of flip_list.
         np.random.shuffle(moves)
 
@@ -110,24 +181,43 @@ def stochastic_descent(qstart, qtarget, L, T, nsteps, nflip, field_list):
             temp_protocol=deepcopy(random_protocol)
             # Try to update that/those index/indices in the protocol.
             temp_protocol[index_update] = random_protocol[index_update]*(-1) 
-            # Compute time evolution according with the previous updated protocol.
-            evolution=model.evolve_from_protocol(temp_protocol)
-            
-            temp_fidelity = model.compute_fidelity() 
+            # Compute time evolution according with the previous updated protocol (or update the paths of the flipped steps in the tree).
+            if tree is not None:
+                temp_fidelity = tree.trial(*_tree_update(index_update, temp_protocol, nsteps, symmetric))
+            else:
+                temp_fidelity = _protocol_fidelity(model, temp_protocol, symmetric)
+            stats["evaluations"] += 1
 
             # Keep the change in the protocol only if it determines better fidelity, in this case the fidelity is stored in fidelity_values. 
-            if temp_fidelity > fidelity: 
+            # Gains below the tolerance are roundoff (e.g. of different evaluators) and are not accepted.
+            if temp_fidelity > fidelity + 1e-12: 
                 random_protocol=deepcopy(temp_protocol)
                 fidelity=temp_fidelity
                 fidelity_values.append(fidelity)
+                stats["accepted"] += 1
+                if tree is not None:
+                    tree.commit()
                 break
             
             
             # Otherwise the "old" protocol is kept and we move to the next flip/s, unless two conditions are met:
             # 1) the entire list of "flip indices" is covered and so we are in a minimum 2) condition 1) is satisfied but the obtained fidelity 
-            # is lower than the starting one and awful random protocol was extracted at the beginning and for this reason it is extracted again. 
-            if flip==moves[-1] and temp_fidelity>start_fidelity:
+            # is lower than the starting one and awful random protocol was extracted at the beginning and for this reason it is extracted again
+            # (never for a warm start, which is kept). 
+            if flip==moves[-1] and (temp_fidelity>start_fidelity or initial_protocol is not None):
                 minima=True
             elif  flip==moves[-1] and temp_fidelity<start_fidelity:
-                random_protocol = np.array(choices(field_list, k=nsteps))    
+                random_protocol = np.array(choices(field_list, k=nfree))    
+                stats["restarts"] += 1
+                if tree is not None:
+                    tree.build(reflect_protocol(random_protocol) if symmetric else random_protocol)
+
+    stats["evolve_calls"] = model.n_evolve
+    stats["matrix_products"] = tree.n_products if tree is not None else 0
+    stats["time_descent"] = time.perf_counter() - start_time - stats["time_setup"]
+    stats["evaluations_per_second"] = stats["evaluations"]/max(stats["time_descent"], 1e-12)
+    if symmetric:
+        random_protocol = reflect_protocol(random_protocol)
+    if return_stats:
+        return random_protocol, fidelity_values, stats
     return random_protocol, fidelity_values
\ No newline at end of file
@@ -0,0 +1,177 @@
+'''
+    Created on Oct 19th, 2026
+    @authors: Alberto Chimenti, Clara Eminente and Matteo Guida.
+    Purpose: (PYTHON3 IMPLEMENTATION)
+        Actor-learner training of QctRL.Agent: actor processes simulate episodes with a periodically refreshed snapshot of the Q-table and
+        send the taken actions and final rewards to the learner, which applies the Q-table updates and broadcasts the table.
+'''
+
+import numpy as np
+import multiprocessing as mp
+import queue
+import time
+
+
+def _actor(worker_id, agent, starting_action, shared_qtable, lock, version, epsilon, stop, results, seed):
+    '''
+    Actor process: runs episodes with the behavioural policy of the (local copy of the) Agent and the latest broadcast Q-table. For each episode
+    the action indices, the flags of the non greedy actions and the final reward are put in the results queue.
+    '''
+    np.random.seed(seed)
+    qtable = np.frombuffer(shared_qtable, dtype=float).reshape(agent.qtable.shape)
+    local_version = -1
+    actions = np.zeros(agent.nsteps, dtype=np.int8)
+    explored = np.zeros(agent.nsteps, dtype=bool)
+
+    while not stop.is_set():
+        if version.value != local_version:
+            with lock:
+                np.copyto(agent.qtable, qtable)
+                local_version = version.value
+
+        eps = epsilon.value
+        agent.env.reset(starting_action)
+        agent.env.model.reset()
+        if agent.cache is not None:
+            agent.cache.reset(agent.env.model)
+        for step in range(agent.nsteps):
+            state = agent.env.state.current
+            action = agent.select_action(state, eps)
+            actions[step] = action
+            explored[step] = agent.qtable[state, action] != np.max(agent.qtable[state])
+            agent._evolve(agent.env.all_actions[action])
+            agent.env.move(action, step == agent.nsteps - 1)
+
+        while not stop.is_set():
+            try:
+                results.put((worker_id, actions.copy(), explored.copy(), agent.env.reward), timeout=0.1)
+                break
+            except queue.Full:
+                pass
+
+
+def train_actor_learner(agent, starting_action, episodes, alpha_vec, replay_freq, replay_episodes, epsilon_i=1, epsilon_f=0, workers=2,
+                        sync_freq=10, seed=None, verbose=False):
+    '''
+    Trains the Agent with worker processes simulating the episodes (actors) while this process (learner) applies the Q-table updates in
+    the order the episodes arrive (see Agent.learn_from_episode) and broadcasts the Q-table to the actors every sync_freq episodes.
+    Replay episodes of the best protocol do not need any simulation (the evolution is deterministic) and are run by the learner only.
+    The agent environment must be initialized (see Agent._init_evironment): each actor evolves its own copy of the quantum model.
+
+    INPUTS:
+    agent: Agent object with initialized environment
+    starting_action, episodes, alpha_vec, replay_freq, replay_episodes: see Agent.train_agent
+    epsilon_i: (optional) float, starting epsilon value for RB-epsiolon-D
+    epsilon_f: (optional) float, final epsilon value for RB-epsiolon-D
+    workers: integer, number of actor processes
+    sync_freq: integer, number of learned episodes between two broadcasts of the Q-table
+    seed: (optional) integer, seed of the actors random number generators (actor i uses seed+i)
+    verbose: (optional) boolean, prints each new best protocol
+
+    Throughput metrics (episodes, replay episodes, episodes per second and episodes simulated by each actor) are stored in agent.stats.
+
+    OUTPUTS:
+    rewards, mavg_rewards, epsilons: np.arrays(dtype=float32), as returned by Agent.train_agent
+    '''
+    from tqdm import tqdm
+
+    total_episodes = episodes + ((episodes-1)//replay_freq)*replay_episodes
+    logs = np.zeros([3, total_episodes+1], dtype=np.float32)
+    n_log = 0
+
+    if agent.best_protocol is None:
+        agent.best_reward = -1
+    agent.epsilon_f = epsilon_f
+    agent.epsilon_i = epsilon_i
+    agent.counter = 0
+    agent.avg_reward = 0
+    eps = agent.epsilon_i
+    logs[2, 0] = eps
+    mavg = 0
+    if seed is None:
+        seed = np.random.randint(2**31 - workers)
+
+    # Shared Q-table (written by the learner only) and epsilon.
+    ctx = mp.get_context()
+    shared_qtable = ctx.RawArray('d', agent.qtable.size)
+    qtable = np.frombuffer(shared_qtable, dtype=float).reshape(agent.qtable.shape)
+    np.copyto(qtable, agent.qtable)
+    lock = ctx.Lock()
+    version = ctx.Value('i', 0, lock=False)
+    epsilon = ctx.Value('d', eps, lock=False)
+    stop = ctx.Event()
+    results = ctx.Queue(maxsize=4*workers)
+
+    actors = [ctx.Process(target=_actor, args=(i, agent, starting_action, shared_qtable, lock, version, epsilon, stop, results, seed+i),
+                          daemon=True) for i in range(workers)]
+    for actor in actors:
+        actor.start()
+
+    stats = {"episodes": 0, "replay_episodes": 0, "workers": workers, "episodes_per_worker": [0]*workers}
+    start_time = time.perf_counter()
+    try:
+        for index in tqdm(range(episodes)):
+            worker_id, actions, explored, reward = results.get()
+            actions = actions.astype(int)
+            stats["episodes_per_worker"][worker_id] += 1
+
+            agent.learn_from_episode(starting_action, actions, reward, alpha_vec[index], eps, explored=explored)
+            stats["episodes"] += 1
+            mavg = ((mavg*index) + reward)/(index+1)
+
+            if index%20==0:
+                eps = agent.update_greedyness(episodes, index, eps, mavg)
+                epsilon.value = eps
+
+            logs[0, n_log] = reward
+            n_log += 1
+            logs[1, n_log] = mavg
+            logs[2, n_log] = eps
+
+            #### BEST REWARD/PROTOCOL UPDATE ####
+            if agent.best_reward < reward:
+                agent._store_best(np.array(agent.env.all_actions)[actions], actions)
+                agent.best_reward = reward
+                if verbose:
+                    print('\nNew best protocol {} with reward {}'.format(index, agent.best_reward))
+
+            # Replay episodes (no simulation needed)
+            if index%replay_freq==0 and index!=0:
+                for _ in range(replay_episodes):
+                    agent.learn_from_episode(starting_action, agent.best_actions, agent.best_reward, alpha_vec[index], eps)
+                    mavg = ((mavg*index) + agent.best_reward)/(index+1)
+                    logs[0, n_log] = agent.best_reward
+                    n_log += 1
+                    logs[1, n_log] = mavg
+                    logs[2, n_log] = eps
+                stats["replay_episodes"] += replay_episodes
+
+            #### BROADCAST ####
+            if (index+1)%sync_freq==0:
+                with lock:
+                    np.copyto(qtable, agent.qtable)
+                    version.value += 1
+    finally:
+        stop.set()
+        # empty the queue so that the actors blocked on put can exit
+        while any(actor.is_alive() for actor in actors):
+            try:
+                results.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        for actor in actors:
+            actor.join()
+
+    # Evaluate the best protocol on the learner model (to store the path) and the greedy protocol
+    if agent.best_protocol is not None:
+        agent.seed_protocol(np.copy(agent.best_protocol))
+    _, reward = agent.generate_protocol(starting_action)
+    logs[0, n_log] = reward
+
+    stats["time_total"] = time.perf_counter() - start_time
+    stats["episodes_per_second"] = (stats["episodes"] + stats["replay_episodes"])/max(stats["time_total"], 1e-12)
+    agent.stats = stats
+    agent.stop_reason = None
+    agent.stop_episode = None
+
+    return logs[0, :n_log+1], logs[1, :n_log+1], logs[2, :n_log+1]
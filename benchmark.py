@@ -0,0 +1,214 @@
+'''
+    Created on Oct 19th, 2026
+    @authors: Alberto Chimenti, Clara Eminente and Matteo Guida.
+    Purpose: (PYTHON3 IMPLEMENTATION)
+        Benchmark suite for the simulator, SD and RL hot paths. Results are written to JSON together with machine metadata
+        and optionally compared against a stored baseline.
+'''
+
+import numpy as np
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+from Qmodel import quantum_model, compute_H_and_LA, ground_state
+from SD import stochastic_descent, correlation
+from QctRL import Agent
+
+########################
+## PARAMETERS ##########
+########################
+parser = argparse.ArgumentParser(prog = '\nBenchmark suite for the quantum control code\n',
+                            description = 'The program times the main hot paths (Hamiltonian construction and diagonalization, time evolution, stochastic descent, RL episodes and q(T) computation),\nwrites the results to a JSON file and compares them with a baseline if given.')
+
+parser.add_argument('--out', type=str, nargs='?', default='bench_results.json', help='Output JSON file')
+parser.add_argument('--baseline', type=str, nargs='?', default='bench_baseline.json', help='Baseline JSON file to compare with')
+parser.add_argument('--save_baseline', action='store_true', help='Store the results as the new baseline instead of comparing with it')
+parser.add_argument('--threshold', type=float, nargs='?', default=0.2, help='Relative slowdown w.r.t. the baseline considered a regression')
+parser.add_argument('--max_L', type=int, nargs='?', default=12, help='Largest number of qubits for the Hamiltonian benchmarks')
+parser.add_argument('--repeat', type=int, nargs='?', default=5, help='Number of repetitions of each benchmark')
+parser.add_argument('--only', type=str, nargs='?', default=None, help='Run only the benchmarks whose name contains this string')
+
+########################
+########################
+########################
+
+
+def timeit(fn, repeat=5, number=1, setup=None):
+    '''
+    Times a function.
+
+    INPUTS:
+    fn: callable without arguments, the function to time
+    repeat: integer, number of repetitions
+    number: integer, number of calls per repetition
+    setup: (optional) callable without arguments, called (untimed) before each repetition
+
+    OUTPUTS:
+    result: dictionary with minimum, mean and standard deviation of the time per call (in seconds)
+    '''
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        times.append((time.perf_counter() - start)/number)
+    return {"min": min(times), "mean": float(np.mean(times)), "std": float(np.std(times)), "repeat": repeat, "number": number}
+
+
+def import_time(statement, repeat=5):
+    '''
+    Times a statement (e.g. an import) in a fresh python interpreter, subtracting the interpreter start-up time
+    '''
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    def run(code):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=cwd, check=True)
+        return time.perf_counter() - start
+    startup = min(run("pass") for _ in range(repeat))
+    times = [run(statement) - startup for _ in range(repeat)]
+    return {"min": min(times), "mean": float(np.mean(times)), "std": float(np.std(times)), "repeat": repeat, "number": 1}
+
+
+def machine_metadata():
+    '''
+    Collects information about the machine and the software versions used for the benchmark
+    '''
+    import scipy
+    return {
+        "date": datetime.now().isoformat(),
+        "node": platform.node(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "python": sys.version,
+        "numpy": np.__version__,
+        "scipy": scipy.__version__,
+        }
+
+
+def _states(L):
+    return ground_state(L, -2), ground_state(L, +2)
+
+
+def benchmarks(max_L=12, repeat=5):
+    '''
+    Generator of the benchmarks: yields couples (name, timing function) where timing function returns the timeit result
+    '''
+    h_list = [-4, 4]
+
+    # Import time of the library modules and of the entry points (fresh interpreter)
+    for module in ["Qmodel", "SD", "QctRL", "RL_training", "script_SD"]:
+        yield "import_{}".format(module), lambda module=module: import_time("import "+module, repeat)
+
+    # Hamiltonian construction and diagonalization
+    for L in range(1, max_L+1):
+        rep = repeat if L <= 8 else 1
+        yield "compute_H_and_LA_L{}".format(L), lambda L=L, rep=rep: timeit(lambda: compute_H_and_LA(L, 1, 4), rep)
+        yield "ground_state_L{}".format(L), lambda L=L, rep=rep: timeit(lambda: ground_state(L, -2), rep)
+
+    # Time evolution, per step and for a whole protocol
+    for L in [1, 4, 8]:
+        if L > max_L:
+            continue
+        def evolve_step(L=L):
+            qstart, qtarget = _states(L)
+            model = quantum_model(qstart, qtarget, 0.025, L, 1, h_list, history=False)
+            return timeit(lambda: model.evolve(4), repeat, number=1000, setup=model.reset)
+        yield "evolve_step_L{}".format(L), evolve_step
+
+        def evolve_protocol(L=L):
+            qstart, qtarget = _states(L)
+            model = quantum_model(qstart, qtarget, 0.025, L, 1, h_list, history=False)
+            protocol = np.random.RandomState(0).choice(h_list, 100)
+            return timeit(lambda: model.evolve_from_protocol(protocol), repeat, setup=model.reset)
+        yield "evolve_from_protocol_100_L{}".format(L), evolve_protocol
+
+    # Full stochastic descent run at fixed seed
+    def sd_run():
+        qstart, qtarget = _states(1)
+        def setup():
+            random.seed(0)
+            np.random.seed(0)
+        return timeit(lambda: stochastic_descent(qstart, qtarget, 1, 2.0, 50, 1, h_list), repeat, setup=setup)
+    yield "stochastic_descent_L1_T2_n50", sd_run
+
+    # RL episode throughput
+    for L in [1, 4]:
+        if L > max_L:
+            continue
+        def rl_episode(L=L):
+            qstart, qtarget = _states(L)
+            model = quantum_model(qstart, qtarget, 0.025, L, 1, h_list)
+            learner = Agent(100, len(h_list))
+            learner._init_evironment(model, 0, h_list)
+            np.random.seed(0)
+            return timeit(lambda: learner.train_episode(0, 0.9, 0.5), repeat, number=20)
+        yield "train_episode_100_L{}".format(L), rl_episode
+
+    # q(T) on a large protocol matrix
+    def corr():
+        matrix = np.random.RandomState(0).choice([-4, 4], size=(1000, 400))
+        return timeit(lambda: correlation(matrix, 4), repeat)
+    yield "correlation_1000x400", corr
+
+
+def compare(results, baseline, threshold):
+    '''
+    Compares the results with the baseline (ratio of the minimum times)
+
+    OUTPUTS:
+    regressions: list of strings, the benchmarks slower than the baseline by more than threshold
+    '''
+    regressions = []
+    print("\n{:<40} {:>12} {:>12} {:>8}".format("benchmark", "baseline [s]", "current [s]", "ratio"))
+    for name, res in results.items():
+        if name not in baseline:
+            continue
+        ratio = res["min"]/baseline[name]["min"]
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  <--- REGRESSION"
+            regressions.append(name)
+        print("{:<40} {:>12.3e} {:>12.3e} {:>8.2f}{}".format(name, baseline[name]["min"], res["min"], ratio, flag))
+    return regressions
+
+
+if __name__ == "__main__":
+
+    ### Parse input arguments
+    args = parser.parse_args()
+
+    results = {}
+    for name, bench in benchmarks(args.max_L, args.repeat):
+        if args.only is not None and args.only not in name:
+            continue
+        results[name] = bench()
+        print("{:<40} {:.3e} s".format(name, results[name]["min"]))
+
+    output = {"metadata": machine_metadata(), "results": results}
+    with open(args.out, 'w') as f:
+        json.dump(output, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(output, f, indent=2)
+        print("\nBaseline saved in", args.baseline)
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline["results"], args.threshold)
+        if regressions:
+            print("\n{} benchmark(s) slower than the baseline by more than {:.0%}".format(len(regressions), args.threshold))
+            sys.exit(1)
+        print("\nNo regressions w.r.t. the baseline")
+    else:
+        print("\nNo baseline found in", args.baseline, "(use --save_baseline to create it)")
@@ -12,16 +12,79 @@ class state_object(object):
 
     Generic reinforcement learning object.
     This Class contains all the elements necessary to keep track of the moves withinf the environment of an RL 
-    agent in a Q-Learning algorithm.
+    agent in a Q-Learning algorithm. The visited states are stored in the episode_recorder of the environment.
 
     """
 
+    __slots__ = ('initial', 'previous', 'action', 'current')
+
     def __init__(self):
+        self.reset()
+
+    def reset(self):
         self.initial = None
         self.previous = None
         self.action = None # Action(index) which moved previous-->current
         self.current = None
-        self.visited = [] #List of visited states
+
+
+class episode_recorder(object):
+    """
+
+    Preallocated recorder of an episode.
+    States, action indices and field values are stored in fixed-size numpy arrays which are reused across episodes, so that
+    recording an episode does not allocate any memory. The arrays are doubled in size only if an episode exceeds the capacity.
+
+    INITIALIZATION VARIABLES:
+    capacity: integer, maximum number of steps per episode
+
+    """
+
+    __slots__ = ('capacity', 'length', 'states', 'actions', 'fields')
+
+    def __init__(self, capacity=128):
+        self.capacity = capacity
+        self.length = 0
+        self.states = np.zeros(capacity+1, dtype=int)
+        self.actions = np.zeros(capacity, dtype=int)
+        self.fields = np.zeros(capacity, dtype=float)
+
+    def reset(self, initial_state):
+        self.length = 0
+        self.states[0] = initial_state
+
+    def record(self, state, action, field):
+        '''
+        Stores the state reached with the action (index) and the corresponding field value
+        '''
+        if self.length == self.capacity:
+            self._grow()
+        self.actions[self.length] = action
+        self.fields[self.length] = field
+        self.length += 1
+        self.states[self.length] = state
+
+    def _grow(self):
+        self.capacity *= 2
+        self.states = np.resize(self.states, self.capacity+1)
+        self.actions = np.resize(self.actions, self.capacity)
+        self.fields = np.resize(self.fields, self.capacity)
+
+    @property
+    def visited(self):
+        # view of the visited states (initial state included)
+        return self.states[:self.length+1]
+
+    @property
+    def action_indices(self):
+        # view of the action indices taken in the episode
+        return self.actions[:self.length]
+
+    @property
+    def protocol(self):
+        # view of the field values applied in the episode
+        return self.fields[:self.length]
+
 
 class Environment(object):
 
@@ -36,7 +99,10 @@ class Environment(object):
     model: the model underlying the learning. It is only osed to compute the reward.
     starting_action: integer, indexed version of the action to start with
     all_actions: all possible actions
-    history: boolean, if True keeps track of the visited states
+    history: boolean, kept for compatibility (visited states, actions and fields are always stored in the episode recorder)
+    nsteps: integer, number of steps per episode used to preallocate the episode recorder
+    symmetric: boolean, if True an episode is the first half of a time-reflected protocol (see Qmodel.reflect_protocol) whose mirrored
+               tail is applied automatically when computing the reward (see final_reward)
 
     action_map_dict: dictionary, contains couples [action : action_index]
                     e.g. if all_actions is [-4,4] it is {-4 : 0 ; 4 : 1}
@@ -45,10 +111,16 @@ class Environment(object):
     '''
 
 
-    def __init__(self, model, starting_action, all_actions=[-4, +4], history=True):
+    def __init__(self, model, starting_action, all_actions=[-4, +4], history=True, nsteps=128, symmetric=False):
 
         self.history = history
 
+        self.symmetric = symmetric
+
+        self.state = state_object()
+
+        self.recorder = episode_recorder(nsteps)
+
         self.all_actions = all_actions
 
         self.action_map_dict = {all_actions[idx] : idx for idx in range(len(self.all_actions))}
@@ -62,7 +134,7 @@ class Environment(object):
 
         # resets environment
 
-        self.state = state_object() #Saved as indexed quantity for Q-table indexing
+        self.state.reset() #Saved as indexed quantity for Q-table indexing
 
         self.time_step = 0 #Important for action--->state indexing (see. map_state method)
 
@@ -72,8 +144,7 @@ class Environment(object):
 
         self.reward = 0.0
 
-        if self.history:
-            self.state.visited.append(self.state.current)
+        self.recorder.reset(self.state.current)
 
 
     def action_state_map(self, action_idx, t=None):
@@ -114,7 +185,7 @@ class Environment(object):
         return state - time_step*len(self.all_actions)
 
 
-    def move(self, action, final_bool):
+    def move(self, action, final_bool, reward=None):
 
         '''
         Given an action and the current state, the function moves the environment to the new state and computes 
@@ -123,6 +194,7 @@ class Environment(object):
         INPUTS:
         action: iteger, index of the action taken
         final_bool: boolean, if True the reward is computed and stored   
+        reward: (optional) float, reward of an episode simulated elsewhere, stored instead of computing the fidelity of the model
 
         '''
 
@@ -138,10 +210,30 @@ class Environment(object):
         self.state.current = self.action_state_map(action)
 
         #history is updated
-        if self.history:
-            self.state.visited.append(self.state.current)
+        self.recorder.record(self.state.current, action, self.all_actions[action])
         
         # Compute model reward (if the end of the episode is reached)
         if final_bool:
-            self.reward = self.model.compute_fidelity()
-        
\ No newline at end of file
+            self.reward = reward if reward is not None else self.final_reward()
+        
+
+
+    def final_reward(self, protocol=None):
+
+        '''
+        Computes the reward (fidelity) at the end of the episode. In symmetric mode the fidelity of the time-reflected protocol is computed from
+        the half evolution if the model allows it (see quantum_model.reflection_symmetric), otherwise the mirrored tail is evolved.
+
+        INPUTS:
+        protocol: (optional) list of floats, the first half of the protocol (by default the one of the current episode)
+
+        '''
+        if not self.symmetric:
+            return self.model.compute_fidelity()
+        if self.model.reflection_symmetric():
+            return self.model.compute_reflected_fidelity()
+        if protocol is None:
+            protocol = self.recorder.protocol
+        for field in protocol[::-1]:
+            self.model.evolve(-field)
+        return self.model.compute_fidelity()
@@ -0,0 +1,302 @@
+'''
+    Created on Oct 19th, 2026
+    @authors: Alberto Chimenti, Clara Eminente and Matteo Guida.
+    Purpose: (PYTHON3 IMPLEMENTATION)
+        Local protocol evaluation service: a long-lived asyncio server (Unix socket or localhost TCP) keeps the models (and their spectral
+        decompositions) warm and evaluates the fidelity of protocols, coalescing concurrent requests into batched evolutions
+        (see quantum_model.protocol_fidelities). A small blocking client is included.
+
+        Messages are JSON lines. Requests:
+            {"op": "evaluate", "model": {"L": 1, "g": 1, "dt": 0.024, "fields": [-4, 4]}, "protocols": [[4, -4, ...], ...]}
+            {"op": "models"}    list of the loaded models
+            {"op": "stats"}     requests, protocols and batches served
+        Responses: {"fidelities": [...]}, {"models": [...]}, {"stats": {...}} or {"error": "..."}; an optional "id" of the request is echoed.
+'''
+
+import numpy as np
+import argparse
+import asyncio
+import json
+import socket
+import time
+
+from Qmodel import ground_state
+from su2 import make_model
+
+########################
+## PARAMETERS ##########
+########################
+parser = argparse.ArgumentParser(prog = '\nProtocol evaluation server\n',
+                            description = 'The program starts a local server evaluating the fidelity of protocols for (L, g, dt, fields) models, from the ground state at h=-2 to the ground state at h=+2. Concurrent requests for the same model are evaluated in batches.')
+
+parser.add_argument('--socket', type=str, nargs='?', default=None, help='Unix socket path (if not given localhost TCP is used)')
+parser.add_argument('--port', type=int, nargs='?', default=8765, help='TCP port on localhost')
+parser.add_argument('--model', type=float, nargs=3, action='append', default=None, metavar=('L', 'g', 'dt'), help='Model to load at startup (can be repeated)')
+parser.add_argument("--fields", type=float, nargs="+", default=[-4, 4], help='Field values of the models loaded at startup')
+parser.add_argument('--batch_window', type=float, nargs='?', default=0.002, help='Time [s] a batch waits for further requests')
+parser.add_argument('--max_batch', type=int, nargs='?', default=4096, help='Maximum number of protocols in a batch')
+
+########################
+########################
+########################
+
+
+def model_key(L, g, dt, fields):
+    '''
+    Key identifying a model served by evaluation_server
+    '''
+    return (int(L), float(g), float(dt), tuple(sorted(float(field) for field in fields)))
+
+
+class evaluation_server:
+    '''
+
+    Holds the models and batches the evaluation requests. Each model has a queue of pending requests; a batcher task takes the first one, waits
+    batch_window seconds for further requests (up to max_batch protocols), evaluates the protocols grouped by number of steps in a worker thread
+    (so that the event loop keeps accepting requests) and resolves the futures of the requests.
+
+    INITIALIZATION VARIABLES:
+    batch_window: float, time [s] a batch waits for further requests
+    max_batch: integer, maximum number of protocols in a batch
+
+    '''
+    def __init__(self, batch_window=0.002, max_batch=4096):
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.models = {}
+        self.queues = {}
+        self.batchers = {}
+        self.loading = {}
+        self.stats = {"requests": 0, "protocols": 0, "batches": 0, "time_evaluation": 0.}
+
+
+    def load_model(self, L, g, dt, fields):
+        '''
+
+        Builds the model (diagonalization of the hamiltonians of the fields) if it is not loaded yet and returns its key
+
+        '''
+        key = model_key(L, g, dt, fields)
+        if key not in self.models:
+            L, g, dt, fields = key
+            self.models[key] = make_model(ground_state(L, -2, g), ground_state(L, +2, g), dt, L, g, list(fields), history=False)
+        return key
+
+
+    async def load_model_async(self, L, g, dt, fields):
+        '''
+
+        Same as load_model, but a new model is built in a worker thread so that the diagonalization does not block the event loop. Concurrent
+        requests for the same new model wait for the same build.
+
+        '''
+        key = model_key(L, g, dt, fields)
+        if key not in self.models:
+            if key not in self.loading:
+                self.loading[key] = asyncio.get_running_loop().run_in_executor(None, self.load_model, L, g, dt, fields)
+            try:
+                await self.loading[key]
+            finally:
+                self.loading.pop(key, None)
+        return key
+
+
+    async def evaluate(self, key, protocols):
+        '''
+
+        Queues the protocols for the batched evaluation with the model key and waits for their fidelities
+
+        '''
+        if key not in self.queues:
+            self.queues[key] = asyncio.Queue()
+            self.batchers[key] = asyncio.ensure_future(self._batcher(key))
+        future = asyncio.get_running_loop().create_future()
+        await self.queues[key].put((protocols, future))
+        return await future
+
+
+    async def _batcher(self, key):
+        queue = self.queues[key]
+        model = self.models[key]
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await queue.get()]
+            size = len(batch[0][0])
+            deadline = loop.time() + self.batch_window
+            while size < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+                size += len(batch[-1][0])
+
+            start_time = time.perf_counter()
+            try:
+                results = await loop.run_in_executor(None, _evaluate_batch, model, [protocols for protocols, _ in batch])
+            except Exception as error:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(error)
+                continue
+            self.stats["batches"] += 1
+            self.stats["time_evaluation"] += time.perf_counter() - start_time
+            for (_, future), fidelities in zip(batch, results):
+                if not future.done():
+                    future.set_result(fidelities)
+
+
+    async def handle(self, request):
+        '''
+
+        Answers a request (see the module docstring for the messages)
+
+        '''
+        op = request.get("op", "evaluate")
+        if op == "models":
+            return {"models": [{"L": L, "g": g, "dt": dt, "fields": list(fields)} for L, g, dt, fields in list(self.models)]}
+        if op == "stats":
+            return {"stats": dict(self.stats)}
+        if op != "evaluate":
+            return {"error": "unknown op {}".format(op)}
+
+        spec = request["model"]
+        key = await self.load_model_async(spec["L"], spec.get("g", 1), spec["dt"], spec["fields"])
+        protocols = [np.asarray(protocol, dtype=float) for protocol in request["protocols"]]
+        self.stats["requests"] += 1
+        self.stats["protocols"] += len(protocols)
+        if len(protocols) == 0:
+            return {"fidelities": []}
+        fidelities = await self.evaluate(key, protocols)
+        return {"fidelities": fidelities.tolist()}
+
+
+    async def serve_client(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                request = None
+                try:
+                    request = json.loads(line)
+                    response = await self.handle(request)
+                except Exception as error:
+                    response = {"error": "{}: {}".format(type(error).__name__, error)}
+                if isinstance(request, dict) and "id" in request:
+                    response["id"] = request["id"]
+                writer.write((json.dumps(response) + "\n").encode())
+                await writer.drain()
+        finally:
+            writer.close()
+
+
+def _evaluate_batch(model, batch):
+    '''
+    Fidelities of the protocols of all the requests in a batch: the protocols with the same number of steps are evaluated together
+    (see quantum_model.protocol_fidelities). Returns one array of fidelities per request.
+    '''
+    protocols = [protocol for request in batch for protocol in request]
+    fidelities = np.zeros(len(protocols))
+    lengths = np.array([len(protocol) for protocol in protocols])
+    for length in np.unique(lengths):
+        index = np.nonzero(lengths == length)[0]
+        fidelities[index] = model.protocol_fidelities(np.array([protocols[i] for i in index]).reshape(len(index), length))
+    bounds = np.cumsum([0] + [len(request) for request in batch])
+    return [fidelities[bounds[i]:bounds[i+1]] for i in range(len(batch))]
+
+
+async def run_server(server, path=None, port=8765):
+    '''
+    Serves the requests on the Unix socket path (or on localhost TCP port) until cancelled
+    '''
+    if path is not None:
+        listener = await asyncio.start_unix_server(server.serve_client, path=path, limit=2**26)
+    else:
+        listener = await asyncio.start_server(server.serve_client, host='127.0.0.1', port=port, limit=2**26)
+    async with listener:
+        await listener.serve_forever()
+
+
+class evaluation_client:
+    '''
+
+    Blocking client of evaluation_server
+
+    INITIALIZATION VARIABLES:
+    path: (optional) string, Unix socket path of the server
+    port: (optional) integer, localhost TCP port of the server (used if path is None)
+    timeout: (optional) float, socket timeout [s]
+
+    '''
+    def __init__(self, path=None, port=8765, timeout=None):
+        if path is not None:
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.connect(path)
+        else:
+            self.sock = socket.create_connection(('127.0.0.1', port))
+        self.sock.settimeout(timeout)
+        self.file = self.sock.makefile('rb')
+        self.n_requests = 0
+
+
+    def request(self, message):
+        '''
+
+        Sends a request and returns the response (a RuntimeError is raised for error responses)
+
+        '''
+        self.n_requests += 1
+        message = dict(message, id=self.n_requests)
+        self.sock.sendall((json.dumps(message) + "\n").encode())
+        response = json.loads(self.file.readline())
+        if "error" in response:
+            raise RuntimeError(response["error"])
+        return response
+
+
+    def fidelities(self, protocols, L, dt, fields, g=1):
+        '''
+
+        Fidelities of the protocols (list or np.array of size [n_protocols, nsteps]) with the (L, g, dt, fields) model
+
+        '''
+        protocols = [np.asarray(protocol, dtype=float).tolist() for protocol in protocols]
+        response = self.request({"op": "evaluate", "model": {"L": L, "g": g, "dt": dt, "fields": list(fields)}, "protocols": protocols})
+        return np.array(response["fidelities"])
+
+
+    def stats(self):
+        return self.request({"op": "stats"})["stats"]
+
+
+    def close(self):
+        self.file.close()
+        self.sock.close()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+if __name__ == "__main__":
+
+    ### Parse input arguments
+    args = parser.parse_args()
+
+    server = evaluation_server(args.batch_window, args.max_batch)
+    for L, g, dt in (args.model or []):
+        key = server.load_model(int(L), g, dt, args.fields)
+        print("Loaded model L={} g={} dt={} fields={}".format(*key))
+
+    print("Serving on", args.socket if args.socket is not None else "127.0.0.1:{}".format(args.port))
+    try:
+        asyncio.run(run_server(server, args.socket, args.port))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,257 @@
+'''
+    Created on Oct 19th, 2026
+    @authors: Alberto Chimenti, Clara Eminente and Matteo Guida.
+    Purpose: (PYTHON3 IMPLEMENTATION)
+        Exact solver over all the 2^nsteps bang-bang protocols of a quantum_model: global optimum and full fidelity histogram.
+'''
+
+import numpy as np
+import argparse
+import time
+
+from Qmodel import quantum_model, ground_state
+
+########################
+## PARAMETERS ##########
+########################
+parser = argparse.ArgumentParser(prog = '\nExhaustive search of the optimal bang-bang protocol for a L-qubit system\n',
+                            description = 'The program evaluates the fidelity of all the 2^nsteps bang-bang protocols, prints the global optimum and saves it together with the fidelity histogram.')
+
+parser.add_argument('--t_max', type=float, nargs='?', default=2.4, help='Total protocol time')
+parser.add_argument('--nsteps', type=int, nargs='?', default=20, help='Number of timesteps in the protocol')
+parser.add_argument('--L', type=int, nargs='?', default=1, help='Number of qubits to consider')
+parser.add_argument("--h", type=float, nargs="?", default=4, help='Control field value in bang-bang protocol')
+parser.add_argument('--processes', type=int, nargs='?', default=1, help='Number of processes the search space is split across')
+parser.add_argument('--bins', type=int, nargs='?', default=100, help='Number of bins of the fidelity histogram')
+parser.add_argument('--out', type=str, nargs='?', default=None, help='Output .npz file (default exhaustive_L_T_nsteps.npz)')
+
+########################
+########################
+########################
+
+
+def propagators(model):
+    '''
+    Computes the propagators exp(-iH(h)dt) of the two field values of the model (see quantum_model.propagator).
+
+    OUTPUTS:
+    U: np.array of size [2, 2^L, 2^L], U[b] is the propagator of the field model.h_list[b]
+    '''
+    return np.array([model.propagator(field) for field in model.h_list])
+
+
+def tail_matrix(U, qtarget, tail_bits):
+    '''
+    Backward propagation of the target over all the 2^tail_bits endings of a protocol.
+
+    OUTPUTS:
+    X: np.array of size [2^tail_bits, 2^L], row t is <qtarget| U_{b_(n-1)} ... U_{b_(n-s)}, where the bits of t (most significant first)
+       are the last tail_bits values of the protocol. The overlaps of a state psi with all the endings are then X @ psi.
+    '''
+    X = np.conj(qtarget)[None,:]
+    for _ in range(tail_bits):
+        X = np.concatenate([X @ U[0], X @ U[1]])
+    return X
+
+
+def _walk(U, qstate, X, middle_bits, bins, tail_bits, tails=None, weights=None):
+    '''
+    Evaluates all the protocols sharing the state qstate reached after the head of the protocol. The middle bits are walked in Gray-code order
+    (consecutive configurations differ by one flip, the most frequent flip being the last middle step) keeping a stack with the states after each
+    middle step, so that on average two steps are evolved per configuration. All the endings of each configuration are evaluated at once (X @ psi).
+
+    INPUTS:
+    tails: (optional) np.array of integers, endings corresponding to the rows of X (default all the 2^tail_bits endings)
+    weights: (optional) np.array, number of protocols counted in the histogram for each row of X (default 1)
+
+    OUTPUTS:
+    best_fidelity: float, best fidelity found
+    best_index: integer, (middle << tail_bits) | tail of the best protocol
+    counts: np.array of size bins, fidelity histogram
+    '''
+    if tails is None:
+        tails = np.arange(X.shape[0])
+    bits = np.zeros(middle_bits, dtype=int)
+    states = np.zeros((middle_bits+1, len(qstate)), dtype=complex)
+    states[0] = qstate
+    for i in range(middle_bits):
+        states[i+1] = U[0] @ states[i]
+
+    counts = np.zeros(bins, dtype=np.int64)
+    best_fidelity = -1
+    best_index = 0
+    gray = 0
+    for k in range(2**middle_bits):
+        if k > 0:
+            # The flipped bit of the Gray code is the number of trailing zeros of k.
+            j = (k & -k).bit_length() - 1
+            gray ^= 1 << j
+            i = middle_bits - 1 - j
+            bits[i] ^= 1
+            for l in range(i, middle_bits):
+                states[l+1] = U[bits[l]] @ states[l]
+
+        fidelities = np.abs(X @ states[middle_bits])**2
+        counts += np.bincount(np.minimum((fidelities*bins).astype(int), bins-1), weights=weights, minlength=bins).astype(np.int64)
+        t = np.argmax(fidelities)
+        if fidelities[t] > best_fidelity:
+            best_fidelity = fidelities[t]
+            best_index = (gray << tail_bits) | int(tails[t])
+    return best_fidelity, best_index, counts
+
+
+_shared = {}
+
+def _init_worker(U, qstart, X, head_bits, middle_bits, tail_bits, symmetry_bits, bins):
+    _shared.update(U=U, qstart=qstart, X=X, head_bits=head_bits, middle_bits=middle_bits, tail_bits=tail_bits, symmetry_bits=symmetry_bits,
+                   bins=bins)
+
+
+def symmetric_tails(head, head_bits, tail_bits, symmetry_bits):
+    '''
+    Endings evaluated with the head (most significant bit first) when the protocols p and -p[::-1] have the same fidelity (see has_flip_symmetry).
+    The map p -> -p[::-1] acts on the pairs of steps (i, n-1-i) as (0,1) -> (0,1), (1,0) -> (1,0), (0,0) <-> (1,1) (bit 0 is h_list[0]).
+    Looking at the first symmetry_bits pairs, a protocol whose first pair with equal bits is (1,1) is skipped, since its partner (with (0,0)
+    there) is evaluated and counted twice. If all these pairs have different bits the partner has the same head and ending, and both are evaluated.
+
+    OUTPUTS:
+    tails: np.array of integers, the evaluated endings
+    weights: np.array, number of protocols counted for each ending (1 or 2)
+    '''
+    # the weights depend only on the last symmetry_bits steps of the ending
+    patterns = np.arange(2**symmetry_bits)
+    pattern_weights = np.ones(len(patterns))
+    undecided = np.ones(len(patterns), dtype=bool)
+    for i in range(symmetry_bits):
+        first = (head >> (head_bits - 1 - i)) & 1
+        # the pair of step i is step n-1-i, the i-th bit of the ending from the least significant one
+        equal = undecided & (((patterns >> i) & 1) == first)
+        pattern_weights[equal] = 2*(1 - first)
+        undecided &= ~equal
+    weights = np.tile(pattern_weights, 2**(tail_bits - symmetry_bits))
+    tails = np.nonzero(weights)[0]
+    return tails, weights[tails]
+
+
+def _search_head(head):
+    '''
+    Evaluates all the protocols starting with the head_bits given by the integer head (most significant bit first)
+    '''
+    U = _shared["U"]
+    X = _shared["X"]
+    qstate = _shared["qstart"]
+    for i in range(_shared["head_bits"]):
+        qstate = U[(head >> (_shared["head_bits"] - 1 - i)) & 1] @ qstate
+    tails, weights = None, None
+    if _shared["symmetry_bits"] > 0:
+        tails, weights = symmetric_tails(head, _shared["head_bits"], _shared["tail_bits"], _shared["symmetry_bits"])
+        X = X[tails]
+    best_fidelity, best_index, counts = _walk(U, qstate, X, _shared["middle_bits"], _shared["bins"], _shared["tail_bits"], tails, weights)
+    return head, best_fidelity, best_index, counts, X.shape[0]*2**_shared["middle_bits"]
+
+
+def has_flip_symmetry(model, tol=1e-9):
+    '''
+    Checks if the protocols p and -p[::-1] (time-reflected and flipped, h -> -h) have the same fidelity: this is the case if the two field values
+    are opposite, P qtarget = c qstart and qstart is real up to a phase (see quantum_model.reflection_symmetric), as for the ground states at h=-2
+    and h=+2.
+    '''
+    if len(model.h_list) != 2 or not np.isclose(model.h_list[0], -model.h_list[1]):
+        return False
+    return model.reflection_symmetric(tol)
+
+
+def exhaustive_search(model, nsteps, processes=1, bins=100, head_bits=None, tail_bits=None, use_symmetry=True, return_stats=False):
+    '''
+    Computes the fidelity of all the 2^nsteps bang-bang protocols with values model.h_list. Each protocol is split in head (one job for each
+    configuration, jobs are distributed over the processes), middle (walked in Gray-code order reusing the cached prefix states) and tail
+    (all the endings are evaluated in a vectorised batch with a precomputed backward propagation of the target).
+    If the model has the p -> -p[::-1] symmetry (see has_flip_symmetry) only one protocol of most pairs is evaluated (see symmetric_tails).
+
+    INPUTS:
+    model: quantum_model object with two field values in h_list
+    nsteps: integer, steps in the protocol
+    processes: integer, number of processes
+    bins: integer, number of bins of the fidelity histogram in [0,1]
+    head_bits: (optional) integer, steps in the head. By default enough to have at least 4 jobs per process
+    tail_bits: (optional) integer, steps in the tail. By default 2^tail_bits x 2^L is about 2^18
+    use_symmetry: boolean, if False the p -> -p[::-1] symmetry is not used
+    return_stats: boolean, if True a dictionary of metrics is returned as fourth output
+
+    OUTPUTS:
+    best_protocol: np.array() of size nsteps, the protocol with the highest fidelity
+    best_fidelity: float, the global optimum of the fidelity
+    histogram: tuple (counts, bin_edges) as in np.histogram, counts of all the 2^nsteps protocols
+    stats: (only if return_stats) dictionary with the number of evaluated protocols, the use of the symmetry, head/middle/tail steps, time
+           and evaluations per second
+    '''
+    start_time = time.perf_counter()
+    if len(model.h_list) != 2:
+        print("WARNING ----> Exhaustive search needs exactly two field values in h_list")
+        return None
+
+    symmetric = use_symmetry and has_flip_symmetry(model)
+    if tail_bits is None:
+        tail_bits = max(0, 18 - model.L)
+    if head_bits is None:
+        head_bits = int(np.ceil(np.log2(4*processes))) if processes > 1 else 0
+    # With the symmetry the first and last symmetry_bits steps are paired: the evaluated fraction of the protocols is 1/2 + 2^-(symmetry_bits+1).
+    symmetry_bits = min(4, nsteps//2) if symmetric else 0
+    tail_bits = min(max(tail_bits, symmetry_bits), nsteps - symmetry_bits)
+    head_bits = min(max(head_bits, symmetry_bits), nsteps - tail_bits)
+    middle_bits = nsteps - head_bits - tail_bits
+
+    U = propagators(model)
+    X = tail_matrix(U, model.qtarget, tail_bits)
+    heads = range(2**head_bits)
+    args = (U, model.qstart, X, head_bits, middle_bits, tail_bits, symmetry_bits, bins)
+
+    if processes > 1:
+        from multiprocessing import Pool
+        with Pool(processes, initializer=_init_worker, initargs=args) as pool:
+            results = list(pool.imap_unordered(_search_head, heads))
+    else:
+        _init_worker(*args)
+        results = [_search_head(head) for head in heads]
+
+    counts = np.zeros(bins, dtype=np.int64)
+    best_fidelity = -1
+    evaluations = 0
+    for head, fidelity, index, head_counts, head_evaluations in results:
+        counts += head_counts
+        evaluations += head_evaluations
+        if fidelity > best_fidelity:
+            best_fidelity = fidelity
+            best_index = (head << (middle_bits + tail_bits)) | index
+
+    bits = (best_index >> np.arange(nsteps-1, -1, -1)) & 1
+    best_protocol = np.array(model.h_list)[bits]
+
+    stats = {"evaluations": evaluations, "protocols": 2**nsteps, "symmetry": symmetric, "head_bits": head_bits,
+             "middle_bits": middle_bits, "tail_bits": tail_bits, "processes": processes, "time": time.perf_counter() - start_time}
+    stats["evaluations_per_second"] = evaluations/max(stats["time"], 1e-12)
+    histogram = (counts, np.linspace(0, 1, bins+1))
+    if return_stats:
+        return best_protocol, best_fidelity, histogram, stats
+    return best_protocol, best_fidelity, histogram
+
+
+if __name__ == "__main__":
+
+    ### Parse input arguments
+    args = parser.parse_args()
+
+    qstart = ground_state(args.L, -2)
+    qtarget = ground_state(args.L, +2)
+    model = quantum_model(qstart, qtarget, args.t_max/args.nsteps, args.L, 1, [-args.h, args.h], history=False)
+
+    best_protocol, best_fidelity, (counts, edges), stats = exhaustive_search(model, args.nsteps, processes=args.processes, bins=args.bins,
+                                                                             return_stats=True)
+    print("Global optimum fidelity:", best_fidelity)
+    print("Optimal protocol:", best_protocol)
+    print("Evaluated {} protocols in {:.2f} s ({:.3e} protocols per second)".format(stats["evaluations"], stats["time"], stats["evaluations_per_second"]))
+
+    out = args.out
+    if out is None:
+        out = 'exhaustive_'+str(args.L)+'_'+str(args.t_max)+'_'+str(args.nsteps)+'.npz'
+    np.savez(out, best_protocol=best_protocol, best_fidelity=best_fidelity, counts=counts, bin_edges=edges)
@@ -2,19 +2,17 @@
     Created on Oct 25th, 2020
     @authors: Alberto Chimenti, Clara Eminente and Matteo Guida.
     Purpose: (PYTHON3 IMPLEMENTATION)
-        Program to create a gif of the time evolution on the Bloch sphere. 
+        Program to create a gif of the time evolution on the Bloch sphere.
 '''
 
-#plotting on Bloch sphere
-from qutip import basis, Bloch
-import matplotlib.pyplot as plt
-import imageio
+#plotting on Bloch sphere (matplotlib and imageio are imported only when a gif is created)
+import numpy as np
 
 def qutip_qstate(coefs):
     '''
-    This function creates a state to feed into qutip functions. 
+    This function creates a state to feed into qutip functions.
     The basis is the one of one qubit.
-    
+
     Inputs;
     #coefs: np.array(dtype=complex), array containing coeffcients of the quantum state
 
@@ -22,38 +20,127 @@ def qutip_qstate(coefs):
     #QuTip state in one qubit spin basis
 
     '''
+    from qutip import basis
     up = basis(2,0)
     down = basis(2,1)
     return coefs[0]*up + coefs[1]*down
 
 
-def create_gif(qstates, qstart, qtarget, name):
+def bloch_vectors(qstates):
     '''
+    Converts a trajectory of single qubit states into Bloch vectors with a single vectorised computation.
+
     Inputs:
-    # qstates: list of states as np.arrays
-    # qstart, qtarget: respectively the target ans start state
-    # name: name of the output gif
+    #qstates: list of states as np.arrays of size 2 (or np.array of size [nstates, 2])
+
+    Outputs:
+    #vectors: np.array of size [nstates, 3], the (x, y, z) coordinates on the Bloch sphere
+    '''
+    q = np.asarray(qstates, dtype=complex).reshape(-1, 2)
+    q = q/np.linalg.norm(q, axis=1, keepdims=True)
+    overlap = np.conj(q[:,0])*q[:,1]
+    return np.stack([2*overlap.real, 2*overlap.imag, np.abs(q[:,0])**2 - np.abs(q[:,1])**2], axis=1)
+
+
+def _bloch_figure(start, target, size):
+    '''
+    Draws the static part of the Bloch sphere (sphere, axes, start and target states) on an off-screen figure.
+    Returns the canvas, the trail and the current state artists to be updated frame by frame (they are animated, i.e. left out of canvas.draw()).
+    '''
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    fig = Figure(figsize=(size, size))
+    canvas = FigureCanvasAgg(fig)
+    fig.subplots_adjust(left=0, right=1, bottom=0, top=1)
+    ax = fig.add_subplot(111, projection='3d')
+    ax.set_axis_off()
+    ax.set_box_aspect((1, 1, 1))
+    ax.view_init(elev=30, azim=-60)
+    lim = 0.8
+    ax.set_xlim(-lim, lim); ax.set_ylim(-lim, lim); ax.set_zlim(-lim, lim)
+
+    # sphere and axes
+    u, v = np.meshgrid(np.linspace(0, 2*np.pi, 25), np.linspace(0, np.pi, 13))
+    ax.plot_surface(np.cos(u)*np.sin(v), np.sin(u)*np.sin(v), np.cos(v), color='#FFDDDD', alpha=0.2, linewidth=0)
+    ax.plot_wireframe(np.cos(u)*np.sin(v), np.sin(u)*np.sin(v), np.cos(v), color='gray', alpha=0.2, linewidth=0.5)
+    for axis in np.eye(3):
+        ax.plot(*np.stack([-axis, axis], axis=1), color='gray', linewidth=0.8)
+    ax.text(0, 0, 1.2, r'$\left|0\right>$', ha='center')
+    ax.text(0, 0, -1.3, r'$\left|1\right>$', ha='center')
+
+    # start and target states
+    for vector, color in [(start, 'b'), (target, 'g')]:
+        ax.plot([0, vector[0]], [0, vector[1]], [0, vector[2]], color=color, linewidth=2)
+
+    # growing trail and current state
+    trail, = ax.plot([], [], [], linestyle='none', marker='o', color='r', markersize=4, animated=True)
+    current, = ax.plot([], [], [], color='r', linewidth=2, animated=True)
+    return canvas, trail, current
+
+
+def _render_frames(vectors, start, target, first, last, size=5):
     '''
-    
-    b = Bloch()
-    duration=5 #framerate
-    images=[]
+    Renders the frames [first, last) of the trajectory into in-memory RGB arrays.
+    Frame i shows the states 0..i-1 as points and state i as a vector.
+    The sphere is drawn once and kept as background (blitting): at each frame only the newest trail point is drawn into the background and
+    the current state vector on top of it, so that the cost of a frame does not grow with the trail.
+    '''
+    canvas, trail, current = _bloch_figure(start, target, size)
+    ax = trail.axes
+    bbox = canvas.figure.bbox
+    canvas.draw()
+    # the points before the first frame of the chunk are drawn into the background at once
+    if first > 0:
+        trail.set_data_3d(vectors[:first,0], vectors[:first,1], vectors[:first,2])
+        ax.draw_artist(trail)
+    background = canvas.copy_from_bbox(bbox)
+
+    frames = []
+    for i in range(first, last):
+        canvas.restore_region(background)
+        if i > first:
+            trail.set_data_3d(vectors[i-1:i,0], vectors[i-1:i,1], vectors[i-1:i,2])
+            ax.draw_artist(trail)
+            background = canvas.copy_from_bbox(bbox)
+        current.set_data_3d([0, vectors[i,0]], [0, vectors[i,1]], [0, vectors[i,2]])
+        ax.draw_artist(current)
+        frames.append(np.asarray(canvas.buffer_rgba())[:,:,:3].copy())
+    return frames
+
 
-    for (qstate,i) in zip(qstates, range(0,len(qstates))):
+def _render_chunk(args):
+    return _render_frames(*args)
 
-        b.clear()
 
-        b.point_color = "r" # options: 'r', 'g', 'b' etc.
-        b.point_marker = ['o']
-        b.point_size = [40]
+def create_gif(qstates, qstart, qtarget, name, fps=5, processes=1, chunk=50, size=5):
+    '''
+    Inputs:
+    # qstates: list of states as np.arrays
+    # qstart, qtarget: respectively the target ans start state
+    # name: name of the output gif
+    # fps: (optional) frame rate of the gif
+    # processes: (optional) number of processes used to render the frames
+    # chunk: (optional) number of frames rendered by a process at a time
+    # size: (optional) size of the figure in inches
+
+    The trajectory is converted to Bloch vectors once, the frames are rendered in memory (without temporary files) chunk by chunk,
+    optionally in a process pool, and streamed into the gif writer in order.
+    '''
+    import imageio
 
-        b.add_states(qutip_qstate(qstart))
-        b.add_states(qutip_qstate(qtarget))
-        for previous in range(i):
-            b.add_states(qutip_qstate(qstates[previous]),"point") #plots previous visited states as points
-        b.add_states(qutip_qstate(qstate))
-        filename='t.png'
-        b.save(filename)
-        images.append(imageio.imread(filename))
+    vectors = bloch_vectors(qstates)
+    start, target = bloch_vectors([qstart, qtarget])
+    jobs = [(vectors, start, target, first, min(first+chunk, len(vectors)), size) for first in range(0, len(vectors), chunk)]
 
-    imageio.mimsave(name, images, 'GIF', fps=duration)
\ No newline at end of file
+    with imageio.get_writer(name, format='GIF', mode='I', fps=fps) as writer:
+        if processes > 1:
+            from multiprocessing import Pool
+            with Pool(processes) as pool:
+                for frames in pool.imap(_render_chunk, jobs):
+                    for frame in frames:
+                        writer.append_data(frame)
+        else:
+            for job in jobs:
+                for frame in _render_chunk(job):
+                    writer.append_data(frame)
@@ -0,0 +1,172 @@
+'''
+    Created on Oct 19th, 2026
+    @authors: Alberto Chimenti, Clara Eminente and Matteo Guida.
+    Purpose: (PYTHON3 IMPLEMENTATION)
+        GRAPE-style gradient optimisation of continuous control fields h(t) in [h_min, h_max] with exact fidelity gradients.
+'''
+
+import numpy as np
+import time
+from Qmodel import quantum_model, compute_H_and_LA
+
+
+def control_hamiltonians(L, g):
+    '''
+    Splits the hamiltonian of the model as H(h) = H0 + h*Hc (see compute_H_and_LA).
+
+    INPUTS:
+    L: integer > 0, number of qubits in the system
+    g: float, static field along z-axis
+
+    OUTPUTS:
+    H0: 2^L x 2^L numpy array, drift hamiltonian (h=0)
+    Hc: 2^L x 2^L numpy array, control hamiltonian
+    '''
+    H0 = compute_H_and_LA(L, g, 0)["H"]
+    Hc = compute_H_and_LA(L, g, 1)["H"] - H0
+    return H0, Hc
+
+
+def fidelity_and_gradient(protocol, qstart, qtarget, H0, Hc, dt):
+    '''
+    Computes the fidelity reached with a continuous protocol and its exact gradient w.r.t. every field value with one forward
+    and one backward propagation. The derivative of each propagator exp(-iH(h)dt) is computed in the eigenbasis of H(h):
+        (V^dag dU/dh V)_mn = (V^dag Hc V)_mn * (e^{-i l_m dt} - e^{-i l_n dt})/(l_m - l_n)     (-i dt e^{-i l_m dt} if l_m = l_n)
+
+    INPUTS:
+    protocol: np.array of size nsteps, control field values
+    qstart, qtarget: np.array(dtype=complex) of size 2^L, respectively the initial, target quantum states
+    H0, Hc: 2^L x 2^L numpy arrays, drift and control hamiltonians (see control_hamiltonians)
+    dt: float, discrete timestep
+
+    OUTPUTS:
+    fidelity: float, fidelity between qtarget and the evolved state
+    gradient: np.array of size nsteps, derivative of the fidelity w.r.t. each field value
+    '''
+    nsteps = len(protocol)
+
+    # Diagonalize all the step hamiltonians at once.
+    eigval, eigvect = np.linalg.eigh(H0[None,:,:] + np.asarray(protocol, dtype=float)[:,None,None]*Hc[None,:,:])
+    phases = np.exp(-1j*eigval*dt)
+    eigvect_dag = np.conj(eigvect).transpose(0,2,1)
+    U = (eigvect*phases[:,None,:]) @ eigvect_dag
+
+    # Forward propagation of the state and backward propagation of the target.
+    psi = np.zeros((nsteps+1, len(qstart)), dtype=complex)
+    chi = np.zeros((nsteps+1, len(qstart)), dtype=complex)
+    psi[0] = qstart
+    chi[nsteps] = qtarget
+    for k in range(nsteps):
+        psi[k+1] = U[k] @ psi[k]
+    for k in range(nsteps-1, -1, -1):
+        chi[k] = np.conj(U[k].T) @ chi[k+1]
+    overlap = np.vdot(qtarget, psi[nsteps])
+
+    # Divided differences of exp(-i l dt) in the eigenbasis.
+    diff_val = eigval[:,:,None] - eigval[:,None,:]
+    diff_exp = phases[:,:,None] - phases[:,None,:]
+    degenerate = np.abs(diff_val) < 1e-10
+    divided = np.where(degenerate, -1j*dt*phases[:,:,None], diff_exp/np.where(degenerate, 1, diff_val))
+
+    # d<qtarget|psi_N>/dh_k = <chi_{k+1}| dU_k/dh |psi_k>
+    Hc_eig = eigvect_dag @ Hc @ eigvect
+    a = np.einsum('kij,kj->ki', eigvect_dag, chi[1:])
+    b = np.einsum('kij,kj->ki', eigvect_dag, psi[:-1])
+    d_overlap = np.einsum('km,kmn,kn->k', np.conj(a), divided*Hc_eig, b)
+
+    fidelity = np.abs(overlap)**2
+    gradient = 2*np.real(np.conj(overlap)*d_overlap)
+    return fidelity, gradient
+
+
+def project_bang_bang(protocol, h_min, h_max):
+    '''
+    Projects a continuous protocol onto the bang-bang protocols with values {h_min, h_max} (nearest value).
+    '''
+    protocol = np.asarray(protocol, dtype=float)
+    return np.where(protocol >= (h_min + h_max)/2, h_max, h_min)
+
+
+def grape(qstart, qtarget, L, T, nsteps, h_min=-4, h_max=4, g=1, h_init=None, maxiter=500, seed=None, bang_bang=False, return_stats=False):
+    '''
+    Optimises a continuous protocol h(t) in [h_min, h_max] with L-BFGS-B (box constraints) using the exact fidelity gradient.
+
+    INPUTS:
+    qstart, qtarget: np.array(dtype=complex) of size 2^L, respectively the initial, target quantum states
+    L: integer >0, number of Qubits
+    T: float, duration of the protocol
+    nsteps: integer, steps in the protocol
+    h_min, h_max: floats, bounds of the control field
+    g: float, static field along z-axis
+    h_init: (optional) np.array of size nsteps, starting protocol. If None a random protocol is used
+    maxiter: integer, maximum number of L-BFGS-B iterations
+    seed: (optional) integer, seed of the random starting protocol
+    bang_bang: boolean, if True the optimised protocol is projected onto {h_min, h_max} (see project_bang_bang) before being returned,
+               for a comparison with stochastic_descent
+    return_stats: boolean, if True a dictionary of metrics is returned as third output
+
+    OUTPUTS:
+    protocol: np.array() of size nsteps, optimised protocol
+    fidelity_values: list, fidelity after each L-BFGS-B iteration (plus the projected protocol fidelity if bang_bang)
+    stats: (only if return_stats) dictionary with the number of fidelity (and gradient) evaluations, iterations, time and the
+           fidelity of the continuous and of the projected bang-bang protocols
+    '''
+    from scipy.optimize import minimize
+
+    start_time = time.perf_counter()
+    dt = T/nsteps
+    H0, Hc = control_hamiltonians(L, g)
+
+    if h_init is None:
+        h_init = np.random.RandomState(seed).uniform(h_min, h_max, nsteps)
+
+    stats = {"evaluations": 0}
+    fidelity_values = []
+
+    def cost(protocol):
+        stats["evaluations"] += 1
+        fidelity, gradient = fidelity_and_gradient(protocol, qstart, qtarget, H0, Hc, dt)
+        cost.last = fidelity
+        return 1 - fidelity, -gradient
+
+    def callback(protocol):
+        fidelity_values.append(cost.last)
+
+    fidelity_values.append(fidelity_and_gradient(h_init, qstart, qtarget, H0, Hc, dt)[0])
+    result = minimize(cost, h_init, jac=True, method='L-BFGS-B', bounds=[(h_min, h_max)]*nsteps,
+                      callback=callback, options={'maxiter': maxiter})
+    protocol = result.x
+    stats["iterations"] = result.nit
+    stats["fidelity_continuous"] = 1 - result.fun
+
+    if bang_bang:
+        protocol = project_bang_bang(protocol, h_min, h_max)
+        model = quantum_model(qstart, qtarget, dt, L, g, h_list=[h_min, h_max], history=False)
+        model.evolve_from_protocol(protocol)
+        stats["fidelity_bang_bang"] = model.compute_fidelity()
+        fidelity_values.append(stats["fidelity_bang_bang"])
+
+    stats["time"] = time.perf_counter() - start_time
+    if return_stats:
+        return protocol, fidelity_values, stats
+    return protocol, fidelity_values
+
+
+# Simple comparison with stochastic descent for a single qubit.
+if __name__ == "__main__":
+
+    from Qmodel import ground_state
+    from SD import stochastic_descent
+
+    L = 1
+    T = 2.4
+    nsteps = 100
+    qstart = ground_state(L, -2)
+    qtarget = ground_state(L, +2)
+
+    protocol, fidelity_values, stats = grape(qstart, qtarget, L, T, nsteps, seed=0, bang_bang=True, return_stats=True)
+    print("GRAPE: continuous fidelity {:.6f}, bang-bang fidelity {:.6f} with {} evaluations".format(
+        stats["fidelity_continuous"], stats["fidelity_bang_bang"], stats["evaluations"]))
+
+    protocol, fidelity_values, stats = stochastic_descent(qstart, qtarget, L, T, nsteps, 1, [-4, 4], return_stats=True)
+    print("SD: fidelity {:.6f} with {} evaluations".format(fidelity_values[-1], stats["evaluations"]))
@@ -0,0 +1,175 @@
+'''
+    Created on Oct 19th, 2026
+    @authors: Alberto Chimenti, Clara Eminente and Matteo Guida.
+    Purpose: (PYTHON3 IMPLEMENTATION)
+        Coarse-to-fine (multigrid) protocol optimisation: the protocol is optimised at a coarse time resolution, upsampled and used to warm-start
+        stochastic descent or the RL Agent at the next resolution, up to the target number of steps.
+'''
+
+import numpy as np
+import argparse
+import time
+
+from Qmodel import ground_state
+from SD import stochastic_descent
+from QctRL import Agent
+from su2 import make_model
+
+########################
+## PARAMETERS ##########
+########################
+parser = argparse.ArgumentParser(prog = '\nCoarse-to-fine optimisation of the protocol for a L-qubit system\n',
+                            description = 'The program optimises the protocol with stochastic descent (or RL) on a sequence of time grids, each one finer than the previous by a factor "factor", warm-starting each level from the upsampled protocol of the previous one.')
+
+parser.add_argument('--t_max', type=float, nargs='?', default=2.4, help='Total protocol time')
+parser.add_argument('--nsteps', type=int, nargs='?', default=400, help='Number of timesteps of the finest protocol')
+parser.add_argument('--L', type=int, nargs='?', default=1, help='Number of qubits to consider')
+parser.add_argument("--h", type=int, nargs="?", default=4, help='Control field value in bang-bang protocol')
+parser.add_argument('--levels', type=int, nargs='?', default=3, help='Number of resolutions')
+parser.add_argument('--factor', type=int, nargs='?', default=4, help='Ratio between the number of steps of consecutive levels')
+parser.add_argument('--method', type=str, nargs='?', default='sd', choices=['sd', 'rl'], help='Optimiser used at each level')
+parser.add_argument('--episodes', type=int, nargs='?', default=2001, help='RL episodes at each level')
+
+########################
+########################
+########################
+
+
+def level_steps(nsteps, levels, factor):
+    '''
+    Number of steps of each level, from the coarsest to nsteps. The number of levels is reduced if nsteps is not divisible by factor^(levels-1)
+    '''
+    steps = [nsteps]
+    for _ in range(levels - 1):
+        if steps[0] % factor != 0 or steps[0]//factor < 1:
+            print("WARNING ----> nsteps={} is not divisible by {}^{}: using {} levels".format(nsteps, factor, levels-1, len(steps)))
+            break
+        steps.insert(0, steps[0]//factor)
+    return steps
+
+
+def upsample_protocol(protocol, factor):
+    '''
+    Each step of the protocol is repeated factor times (same protocol on a time grid factor times finer)
+    '''
+    return np.repeat(np.asarray(protocol), factor)
+
+
+def upsample_qtable(qtable, nactions, factor):
+    '''
+    Q-table of an Agent with factor times more steps: the state [t, action] takes the values of the coarse state [t//factor, action]
+    (see Environment.action_state_map for the indexing)
+    '''
+    coarse = np.asarray(qtable).reshape(-1, nactions, nactions)
+    return np.repeat(coarse, factor, axis=0).reshape(-1, nactions)
+
+
+def multigrid_sd(qstart, qtarget, L, T, nsteps, nflip, field_list, levels=3, factor=4, return_stats=False):
+    '''
+    Stochastic descent on a sequence of time grids (see level_steps). At each level the descent starts from the upsampled best protocol of the
+    previous level (see stochastic_descent initial_protocol).
+
+    INPUTS:
+    qstart, qtarget: np.array(dtype=complex) of size 2^L, respectively the initial, target quantum states
+    L: integer >0, number of Qubits
+    T: float, duration of the protocol
+    nsteps: integer, steps in the finest protocol
+    nflip: integer, maximum number of flips at a time
+    field_list: list of float, possible field values
+    levels: integer, number of resolutions
+    factor: integer, ratio between the number of steps of consecutive levels
+    return_stats: boolean, if True a list with the metrics of each level is returned as third output
+
+    OUTPUTS:
+    protocol: np.array() of size nsteps, best protocol at the finest level
+    fidelity_values: list, log of updates in fidelity during the descent at the finest level
+    level_stats: (only if return_stats) list of dictionaries (one per level) with nsteps, fidelity, the stochastic_descent metrics (evaluations,
+                 evolve_calls, ...) and the time spent
+    '''
+    protocol = None
+    level_stats = []
+    for n in level_steps(nsteps, levels, factor):
+        start_time = time.perf_counter()
+        if protocol is not None:
+            protocol = upsample_protocol(protocol, n//len(protocol))
+        protocol, fidelity_values, stats = stochastic_descent(qstart, qtarget, L, T, n, nflip, field_list, return_stats=True,
+                                                              initial_protocol=protocol)
+        stats.update({"nsteps": n, "fidelity": fidelity_values[-1], "time": time.perf_counter() - start_time})
+        level_stats.append(stats)
+
+    if return_stats:
+        return protocol, fidelity_values, level_stats
+    return protocol, fidelity_values
+
+
+def multigrid_rl(qstart, qtarget, L, T, nsteps, all_actions, episodes, levels=3, factor=4, g=1, starting_action=0, replay_freq=50,
+                 replay_episodes=40, **kwargs):
+    '''
+    RL training on a sequence of time grids (see level_steps). At each level the Q-table is initialized with the upsampled Q-table of the
+    previous level (see upsample_qtable) and the upsampled best protocol is used as the starting best protocol to be replayed (see Agent.seed_protocol).
+
+    INPUTS:
+    qstart, qtarget: np.array(dtype=complex) of size 2^L, respectively the initial, target quantum states
+    L: integer >0, number of Qubits
+    T: float, duration of the protocol
+    nsteps: integer, steps in the finest protocol
+    all_actions: list of floats, possible field values
+    episodes: integer or list of integers (one per level), training episodes at each level
+    levels: integer, number of resolutions
+    factor: integer, ratio between the number of steps of consecutive levels
+    g: float, static field along z-axis
+    starting_action, replay_freq, replay_episodes: see Agent.train_agent
+    **kwargs: passed to Agent (e.g. cache_size)
+
+    OUTPUTS:
+    learner: Agent object trained at the finest level
+    level_stats: list of dictionaries (one per level) with nsteps, episodes, best reward, evolution steps and time spent
+    '''
+    steps = level_steps(nsteps, levels, factor)
+    if np.isscalar(episodes):
+        episodes = [episodes]*len(steps)
+
+    learner = None
+    level_stats = []
+    for n, n_episodes in zip(steps, episodes):
+        start_time = time.perf_counter()
+        model = make_model(qstart, qtarget, T/n, L, g, all_actions)
+        qtable = None
+        if learner is not None:
+            qtable = upsample_qtable(learner.qtable, len(all_actions), n//learner.nsteps)
+        protocol = learner.best_protocol if learner is not None else None
+
+        learner = Agent(n, len(all_actions), qtable=qtable, **kwargs)
+        learner._init_evironment(model, starting_action, all_actions)
+        if protocol is not None:
+            learner.seed_protocol(upsample_protocol(protocol, n//len(protocol)))
+
+        alpha = np.linspace(0.9, 0.89, n_episodes)
+        learner.train_agent(starting_action, n_episodes, alpha, replay_freq, replay_episodes, verbose=False)
+        level_stats.append({"nsteps": n, "episodes": n_episodes, "fidelity": learner.best_reward, "evolve_calls": model.n_evolve,
+                            "time": time.perf_counter() - start_time})
+
+    return learner, level_stats
+
+
+if __name__ == "__main__":
+
+    ### Parse input arguments
+    args = parser.parse_args()
+
+    qstart = ground_state(args.L, -2)
+    qtarget = ground_state(args.L, +2)
+    h_list = [-args.h, args.h]
+
+    if args.method == 'sd':
+        protocol, fidelity_values, level_stats = multigrid_sd(qstart, qtarget, args.L, args.t_max, args.nsteps, 1, h_list, levels=args.levels,
+                                                              factor=args.factor, return_stats=True)
+    else:
+        learner, level_stats = multigrid_rl(qstart, qtarget, args.L, args.t_max, args.nsteps, h_list, args.episodes, levels=args.levels,
+                                            factor=args.factor)
+
+    print("{:>8} {:>10} {:>14} {:>12} {:>10}".format("nsteps", "fidelity", "evolve_calls", "evaluations", "time [s]"))
+    for stats in level_stats:
+        print("{:>8} {:>10.6f} {:>14} {:>12} {:>10.2f}".format(stats["nsteps"], stats["fidelity"], stats["evolve_calls"],
+                                                               stats.get("evaluations", stats.get("episodes")), stats["time"]))
+    print("Total evolution steps:", sum(stats["evolve_calls"] for stats in level_stats))
@@ -0,0 +1,176 @@
+'''
+    Created on Oct 19th, 2026
+    @authors: Alberto Chimenti, Clara Eminente and Matteo Guida.
+    Purpose: (PYTHON3 IMPLEMENTATION)
+        Population based optimisers of bang-bang protocols (cross-entropy method and genetic algorithm): each generation of protocols is scored
+        with one batched evolution (see quantum_model.protocol_fidelities). Same outputs of SD.stochastic_descent.
+'''
+
+import numpy as np
+import time
+
+from Qmodel import reflect_protocol
+from su2 import make_model
+
+
+def _setup(qstart, qtarget, L, T, nsteps, field_list, symmetric):
+    '''
+    Model and number of free steps shared by the optimisers (see SD.stochastic_descent for the symmetric protocols)
+    '''
+    model = make_model(qstart, qtarget, T/nsteps, L, g=1, h_list=field_list, history=False)
+    if symmetric and (nsteps%2 != 0 or len(field_list) != 2 or field_list[0] != -field_list[1]):
+        print("WARNING ----> Symmetric protocols need an even number of steps and field_list = [-h, h]: searching all protocols")
+        symmetric = False
+    nfree = nsteps//2 if symmetric else nsteps
+    return model, symmetric, nfree
+
+
+def _protocols(indices, field_list, symmetric):
+    '''
+    Protocols (field values) of a population of field indices, reflected if symmetric (see Qmodel.reflect_protocol)
+    '''
+    protocols = np.asarray(field_list, dtype=float)[indices]
+    if symmetric:
+        protocols = np.concatenate([protocols, -protocols[:,::-1]], axis=1)
+    return protocols
+
+
+def _finish(best, field_list, symmetric, fidelity_values, stats, model, start_time, return_stats):
+    stats["evolve_calls"] = model.n_evolve
+    stats["time_descent"] = time.perf_counter() - start_time - stats["time_setup"]
+    stats["evaluations_per_second"] = stats["evaluations"]/max(stats["time_descent"], 1e-12)
+    protocol = np.asarray(field_list)[best]
+    if symmetric:
+        protocol = reflect_protocol(protocol)
+    if return_stats:
+        return protocol, fidelity_values, stats
+    return protocol, fidelity_values
+
+
+def cross_entropy(qstart, qtarget, L, T, nsteps, field_list, population=400, elite=0.1, smoothing=0.7, generations=300, tol=1e-3, seed=None,
+                  return_stats=False, symmetric=False):
+    '''
+    Cross-entropy method: the field value at each step is drawn from independent probabilities (uniform at the beginning). At each generation
+    population protocols are sampled and scored together, and the probabilities move towards the frequencies of the field values in the best
+    elite fraction of the protocols: p <- smoothing*p_elite + (1-smoothing)*p. The search stops when every step has a field value with probability
+    larger than 1-tol (or after the given number of generations).
+
+    INPUTS:
+    qstart, qtarget, L, T, nsteps, field_list: see SD.stochastic_descent
+    population: integer, protocols per generation
+    elite: float, fraction of the population used to update the probabilities
+    smoothing: float in (0, 1], weight of the elite frequencies in the update
+    generations: integer, maximum number of generations
+    tol: float, convergence tolerance on the probabilities
+    seed: (optional) integer, seed of the sampling
+    return_stats: boolean, if True a dictionary of throughput metrics is returned as third output
+    symmetric: boolean, if True only time-reflected protocols are searched (see SD.stochastic_descent)
+
+    OUTPUTS:
+    protocol: np.array() of size nsteps, best protocol found
+    fidelity_values: list, log of updates of the best fidelity (the first value is the fidelity between qstart and qtarget)
+    stats: (only if return_stats) dictionary with the number of fidelity evaluations, evolution steps, generations, the time spent in setup
+           and descent and the evaluations per second
+    '''
+    start_time = time.perf_counter()
+    stats = {"evaluations": 0, "evolve_calls": 0, "generations": 0}
+    model, symmetric, nfree = _setup(qstart, qtarget, L, T, nsteps, field_list, symmetric)
+    rng = np.random.RandomState(seed)
+    nfields = len(field_list)
+    n_elite = max(int(elite*population), 1)
+
+    probabilities = np.full((nfree, nfields), 1/nfields)
+    fidelity_values = [model.compute_fidelity()]
+    best, best_fidelity = None, -1
+    stats["time_setup"] = time.perf_counter() - start_time
+
+    for _ in range(generations):
+        stats["generations"] += 1
+        # Sample the field index of each step by inverting the cumulative probabilities.
+        cumulative = np.cumsum(probabilities, axis=1)
+        indices = (rng.random_sample((population, nfree, 1)) > cumulative[None,:,:-1]).sum(axis=2)
+        fidelities = model.protocol_fidelities(_protocols(indices, field_list, symmetric))
+        stats["evaluations"] += population
+
+        order = np.argsort(fidelities)[::-1]
+        if fidelities[order[0]] > best_fidelity:
+            best, best_fidelity = indices[order[0]].copy(), fidelities[order[0]]
+            fidelity_values.append(best_fidelity)
+
+        frequencies = np.stack([(indices[order[:n_elite]] == k).mean(axis=0) for k in range(nfields)], axis=1)
+        probabilities = smoothing*frequencies + (1 - smoothing)*probabilities
+        if np.all(probabilities.max(axis=1) > 1 - tol):
+            break
+
+    return _finish(best, field_list, symmetric, fidelity_values, stats, model, start_time, return_stats)
+
+
+def genetic(qstart, qtarget, L, T, nsteps, field_list, population=400, elite=0.05, mutation=None, tournament=3, generations=300, patience=30,
+            seed=None, return_stats=False, symmetric=False):
+    '''
+    Genetic algorithm: at each generation the population is scored together, the elite fraction is copied to the next generation and the rest
+    is made of children of parents chosen by tournament selection, combined with two-point crossover (which keeps the bang-bang segments)
+    and mutated by changing each step to another field value with probability mutation. The search stops when the best fidelity has not
+    improved for patience generations (or after the given number of generations).
+
+    INPUTS:
+    qstart, qtarget, L, T, nsteps, field_list: see SD.stochastic_descent
+    population: integer, protocols per generation
+    elite: float, fraction of the population copied unchanged to the next generation
+    mutation: (optional) float, mutation probability of each step (default 1/number of free steps)
+    tournament: integer, number of protocols competing to be a parent
+    generations: integer, maximum number of generations
+    patience: integer, number of generations without improvement before stopping
+    seed: (optional) integer, seed of the random operators
+    return_stats: boolean, if True a dictionary of throughput metrics is returned as third output
+    symmetric: boolean, if True only time-reflected protocols are searched (see SD.stochastic_descent)
+
+    OUTPUTS:
+    protocol, fidelity_values, stats: see cross_entropy
+    '''
+    start_time = time.perf_counter()
+    stats = {"evaluations": 0, "evolve_calls": 0, "generations": 0}
+    model, symmetric, nfree = _setup(qstart, qtarget, L, T, nsteps, field_list, symmetric)
+    rng = np.random.RandomState(seed)
+    nfields = len(field_list)
+    n_elite = max(int(elite*population), 1)
+    n_children = population - n_elite
+    if mutation is None:
+        mutation = 1/nfree
+
+    indices = rng.randint(nfields, size=(population, nfree))
+    fidelity_values = [model.compute_fidelity()]
+    best, best_fidelity = None, -1
+    stale = 0
+    stats["time_setup"] = time.perf_counter() - start_time
+
+    for _ in range(generations):
+        stats["generations"] += 1
+        fidelities = model.protocol_fidelities(_protocols(indices, field_list, symmetric))
+        stats["evaluations"] += population
+
+        order = np.argsort(fidelities)[::-1]
+        if fidelities[order[0]] > best_fidelity:
+            best, best_fidelity = indices[order[0]].copy(), fidelities[order[0]]
+            fidelity_values.append(best_fidelity)
+            stale = 0
+        else:
+            stale += 1
+            if stale >= patience:
+                break
+
+        # Tournament selection: the parent is the best of tournament random protocols.
+        contestants = rng.randint(population, size=(2, n_children, tournament))
+        parents = np.take_along_axis(contestants, np.argmax(fidelities[contestants], axis=2)[...,None], axis=2)[...,0]
+        # Two-point crossover: the child takes the steps in [a, b) from the second parent.
+        cuts = np.sort(rng.randint(nfree + 1, size=(n_children, 2)), axis=1)
+        steps = np.arange(nfree)[None,:]
+        middle = (steps >= cuts[:,:1]) & (steps < cuts[:,1:])
+        children = np.where(middle, indices[parents[1]], indices[parents[0]])
+        # Mutation: shift the field index by a random non zero amount.
+        mutated = rng.random_sample(children.shape) < mutation
+        children = np.where(mutated, (children + rng.randint(1, max(nfields, 2), size=children.shape)) % nfields, children)
+
+        indices = np.concatenate([indices[order[:n_elite]], children])
+
+    return _finish(best, field_list, symmetric, fidelity_values, stats, model, start_time, return_stats)
@@ -1,5 +1,172 @@
-from cProfile import Profile
-import pstats
+'''
+    Created on Oct 19th, 2026
+    @authors: Alberto Chimenti, Clara Eminente and Matteo Guida.
+    Purpose: (PYTHON3 IMPLEMENTATION)
+        Low-overhead instrumentation: wall time and number of calls are accumulated per instrumented section and a single
+        summary is printed (or saved as JSON) at exit.
+
+    Usage:
+    Decorate a function with @timed("name") or wrap a block of code with "with section('name'):".
+    Instrumentation is off by default and costs a single flag check per call. It is switched on either by setting the
+    environment variable QIC_PROFILE (to 1 to print the summary or to a .json file name to save it) or by calling enable(),
+    e.g. from the --profile flag of the scripts. QIC_PROFILE_SAMPLE=N additionally runs one call out of N of each section
+    under cProfile and saves the collected stats in a .prof file.
+    Instrumented sections: hamiltonian (H build + eigh), eigh, evolve, fidelity, action_selection, q_update and train_episode.
+'''
+
+import atexit
+import json
+import os
+import time
+from functools import wraps
+
+_enabled = False
+_out = None
+_sample = 0
+_profiler = None
+# nesting level of the sampled sections: the profiler is switched on and off by the outermost one only
+_profile_depth = 0
+# name -> [number of calls, total wall time]
+_sections = {}
+
+
+def enable(out=None, sample=0):
+    '''
+    Switches the instrumentation on and registers the dump of the summary at exit
+
+    INPUTS:
+    out: (optional) string, JSON file where the summary is saved. If None the summary is printed in stdout
+    sample: (optional) integer, if > 0 one call out of sample of each section is run under cProfile
+    '''
+    global _enabled, _out, _sample
+    if not _enabled:
+        atexit.register(dump)
+    _enabled = True
+    _out = out
+    _sample = sample
+
+
+def is_enabled():
+    return _enabled
+
+
+def _record(name, elapsed):
+    entry = _sections.get(name)
+    if entry is None:
+        _sections[name] = [1, elapsed]
+    else:
+        entry[0] += 1
+        entry[1] += elapsed
+
+
+def _run(name, fn, args, kwargs):
+    global _profiler, _profile_depth
+    entry = _sections.get(name)
+    # sections nested in a sampled one are already under the profiler
+    sampled = _sample > 0 and _profile_depth == 0 and (entry is None or entry[0] % _sample == 0)
+    start = time.perf_counter()
+    try:
+        if sampled:
+            if _profiler is None:
+                from cProfile import Profile
+                _profiler = Profile()
+            _profile_depth += 1
+            _profiler.enable()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _profiler.disable()
+                _profile_depth -= 1
+        return fn(*args, **kwargs)
+    finally:
+        _record(name, time.perf_counter() - start)
+
+
+def timed(name):
+    '''
+    Decorator accumulating wall time and number of calls of the decorated function under the section name
+    '''
+    def decorator(fn):
+        @wraps(fn)
+        def inner(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            return _run(name, fn, args, kwargs)
+        return inner
+    return decorator
+
+
+class _section(object):
+
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        _record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class _null_section(object):
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_null = _null_section()
+
+
+def section(name):
+    '''
+    Context manager accumulating wall time and number of executions of a block of code under the section name
+    '''
+    if not _enabled:
+        return _null
+    return _section(name)
+
+
+def summary():
+    '''
+    OUTPUTS:
+    summary: dictionary, for each section the number of calls, the total and the mean wall time (in seconds)
+    '''
+    return {name : {"calls": calls, "total": total, "mean": total/calls} for name, (calls, total) in _sections.items()}
+
+
+def reset():
+    '''
+    Deletes the accumulated timings
+    '''
+    _sections.clear()
+
+
+def dump():
+    '''
+    Prints the summary (or saves it to the JSON file given to enable) and saves the sampled cProfile stats if any
+    '''
+    stats = summary()
+    if _out is not None:
+        with open(_out, 'w') as f:
+            json.dump(stats, f, indent=2)
+        print("Profiling summary saved in", _out)
+    else:
+        print("\n{:<25} {:>10} {:>12} {:>12}".format("section", "calls", "total [s]", "mean [s]"))
+        for name, entry in sorted(stats.items(), key=lambda item: -item[1]["total"]):
+            print("{:<25} {:>10} {:>12.4f} {:>12.3e}".format(name, entry["calls"], entry["total"], entry["mean"]))
+    if _profiler is not None:
+        fname = (os.path.splitext(_out)[0] if _out is not None else 'profile') + '.prof'
+        _profiler.dump_stats(fname)
+        print("Sampled cProfile stats saved in", fname)
+
 
 def profile(sort_args=['cumulative'], print_args=[10]):
     '''
@@ -10,6 +177,8 @@ def profile(sort_args=['cumulative'], print_args=[10]):
         @profile(sort_args=['name'], print_args=[N])
     with N = # of tasks which are listed
     '''
+    from cProfile import Profile
+    import pstats
     profiler = Profile()
 
     def decorator(fn):
@@ -22,4 +191,10 @@ def profile(sort_args=['cumulative'], print_args=[10]):
                 stats.strip_dirs().sort_stats(*sort_args).print_stats(*print_args)
             return result
         return inner
-    return decorator
\ No newline at end of file
+    return decorator
+
+
+# Switch on the instrumentation from the environment (QIC_PROFILE=0, false, no or off leave it off)
+_value = os.environ.get('QIC_PROFILE', '')
+if _value.strip().lower() not in ('', '0', 'false', 'no', 'off'):
+    enable(out=_value if _value.endswith('.json') else None, sample=int(os.environ.get('QIC_PROFILE_SAMPLE', 0)))
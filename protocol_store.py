@@ -0,0 +1,210 @@
+'''
+    Created on Oct 19th, 2026
+    @authors: Alberto Chimenti, Clara Eminente and Matteo Guida.
+    Purpose: (PYTHON3 IMPLEMENTATION)
+        Compact storage of bang-bang protocols (one bit per step) with metadata, and q(T) and Hamming distance statistics computed directly
+        on the packed bits.
+'''
+
+import numpy as np
+import json
+import os
+
+# Number of ones in each byte value.
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+# Metadata stored for each protocol.
+record_dtype = np.dtype([('L', '<i4'), ('g', '<f8'), ('T', '<f8'), ('fidelity', '<f8')])
+
+
+class protocol_store:
+    '''
+
+    Append-only store of bang-bang protocols in a directory:
+        meta.json: alphabet (the two field values, a protocol value alphabet[1] is stored as bit 1) and nsteps
+        bits.bin: protocols packed with np.packbits, ceil(nsteps/8) bytes each
+        records.bin: metadata of each protocol (see record_dtype)
+    Protocols are appended in bulk and read back through memory maps.
+
+    INITIALIZATION VARIABLES:
+    path: string or Path, directory of the store (created if it does not exist)
+    alphabet: list of two floats, field values of the protocols (needed only to create a new store)
+    nsteps: integer, steps in the protocols (needed only to create a new store)
+    overwrite: boolean, if True the protocols of an existing store are removed and a new store is created
+
+    '''
+    def __init__(self, path, alphabet=None, nsteps=None, overwrite=False):
+        self.path = str(path)
+        meta_file = os.path.join(self.path, 'meta.json')
+        self.bits_file = os.path.join(self.path, 'bits.bin')
+        self.records_file = os.path.join(self.path, 'records.bin')
+        if overwrite:
+            for fname in [meta_file, self.bits_file, self.records_file]:
+                if os.path.exists(fname):
+                    os.remove(fname)
+
+        if os.path.exists(meta_file):
+            with open(meta_file) as f:
+                meta = json.load(f)
+            if (alphabet is not None and list(alphabet) != meta["alphabet"]) or (nsteps is not None and nsteps != meta["nsteps"]):
+                print("WARNING ----> alphabet and nsteps of the existing store in {} are used".format(self.path))
+            alphabet, nsteps = meta["alphabet"], meta["nsteps"]
+        else:
+            if alphabet is None or nsteps is None or len(alphabet) != 2:
+                raise ValueError("A new protocol store needs an alphabet of two field values and nsteps")
+            os.makedirs(self.path, exist_ok=True)
+            with open(meta_file, 'w') as f:
+                json.dump({"alphabet": [float(a) for a in alphabet], "nsteps": int(nsteps)}, f)
+        self.alphabet = np.array(alphabet, dtype=float)
+        self.nsteps = int(nsteps)
+        self.nbytes = (self.nsteps + 7)//8
+
+
+    def __len__(self):
+        if not os.path.exists(self.records_file):
+            return 0
+        return os.path.getsize(self.records_file)//record_dtype.itemsize
+
+
+    def append(self, protocols, fidelity, L, g, T):
+        '''
+
+        Appends a set of protocols.
+
+        INPUTS:
+        protocols: np.array of size [n_protocols, nsteps] (or nsteps for a single protocol) with values in the alphabet
+        fidelity: float or np.array of size n_protocols, fidelity of each protocol
+        L, g, T: number of qubits, static field and duration of the protocols (scalars or np.arrays of size n_protocols)
+
+        '''
+        protocols = np.atleast_2d(np.asarray(protocols, dtype=float))
+        if protocols.shape[1] != self.nsteps:
+            raise ValueError("Protocols must have {} steps".format(self.nsteps))
+        bits = np.isclose(protocols, self.alphabet[1])
+        if not np.all(bits | np.isclose(protocols, self.alphabet[0])):
+            print("WARNING ----> Protocol values not in the alphabet {} are stored as {}".format(list(self.alphabet), self.alphabet[0]))
+
+        records = np.zeros(len(protocols), dtype=record_dtype)
+        records['L'] = L
+        records['g'] = g
+        records['T'] = T
+        records['fidelity'] = fidelity
+        with open(self.bits_file, 'ab') as f:
+            f.write(np.packbits(bits, axis=1).tobytes())
+        with open(self.records_file, 'ab') as f:
+            f.write(records.tobytes())
+
+
+    def packed(self):
+        '''
+
+        OUTPUTS:
+        packed: read-only np.memmap (dtype uint8) of size [n_protocols, ceil(nsteps/8)], the packed protocols
+        '''
+        if len(self) == 0:
+            return np.zeros((0, self.nbytes), dtype=np.uint8)
+        return np.memmap(self.bits_file, dtype=np.uint8, mode='r', shape=(len(self), self.nbytes))
+
+
+    def records(self):
+        '''
+
+        OUTPUTS:
+        records: read-only np.memmap (dtype record_dtype) of size n_protocols, the metadata of the protocols
+        '''
+        if len(self) == 0:
+            return np.zeros(0, dtype=record_dtype)
+        return np.memmap(self.records_file, dtype=record_dtype, mode='r', shape=(len(self),))
+
+
+    def select(self, **conditions):
+        '''
+
+        Indices of the protocols whose metadata match the conditions, e.g. select(L=1, T=2.4) (floats are compared with np.isclose)
+        '''
+        records = self.records()
+        mask = np.ones(len(records), dtype=bool)
+        for key, value in conditions.items():
+            mask &= np.isclose(records[key], value)
+        return np.nonzero(mask)[0]
+
+
+    def protocols(self, index=None):
+        '''
+
+        Unpacks the protocols (all of them or the given indices) to field values.
+
+        OUTPUTS:
+        protocols: np.array of size [n_protocols, nsteps]
+        '''
+        packed = self.packed()
+        if index is not None:
+            packed = packed[index]
+        bits = np.unpackbits(packed, axis=1, count=self.nsteps)
+        return self.alphabet[bits]
+
+
+def bit_counts(packed, nsteps):
+    '''
+    Number of protocols with bit 1 at each step, computed on the packed bits one bit plane at a time (without unpacking).
+
+    OUTPUTS:
+    counts: np.array of size nsteps
+    '''
+    packed = np.asarray(packed)
+    counts = np.zeros((packed.shape[1], 8), dtype=np.int64)
+    for b in range(8):
+        counts[:,b] = ((packed >> (7 - b)) & 1).sum(axis=0, dtype=np.int64)
+    return counts.reshape(-1)[:nsteps]
+
+
+def packed_correlation(packed, nsteps):
+    '''
+    Computes the correlation quantity q(T) (see SD.correlation) of a set of packed protocols: with p_j the fraction of protocols with bit 1 at
+    step j, q(T) = mean_j 4 p_j (1-p_j).
+
+    INPUTS:
+    packed: np.array (dtype uint8) of size [n_protocols, ceil(nsteps/8)]
+    nsteps: integer, steps in the protocols
+
+    OUTPUTS:
+    q: float, between 0 and 1
+    '''
+    p = bit_counts(packed, nsteps)/len(packed)
+    return np.mean(4*p*(1 - p))
+
+
+def hamming_distances(packed, other=None, chunk=1024):
+    '''
+    Hamming distances between packed protocols computed with XOR and a popcount lookup table.
+
+    INPUTS:
+    packed: np.array (dtype uint8) of size [n, ceil(nsteps/8)]
+    other: (optional) np.array (dtype uint8) of size [m, ceil(nsteps/8)]. If None the distances between the protocols in packed are computed
+    chunk: integer, rows of packed processed at a time
+
+    OUTPUTS:
+    distances: np.array of size [n, m], number of different steps between each couple of protocols
+    '''
+    packed = np.asarray(packed)
+    other = packed if other is None else np.asarray(other)
+    distances = np.zeros((len(packed), len(other)), dtype=np.int64)
+    for start in range(0, len(packed), chunk):
+        xor = packed[start:start+chunk,None,:] ^ other[None,:,:]
+        distances[start:start+chunk] = _POPCOUNT[xor].sum(axis=2, dtype=np.int64)
+    return distances
+
+
+def hamming_statistics(packed, nsteps):
+    '''
+    Statistics of the Hamming distances between all the couples of packed protocols.
+
+    OUTPUTS:
+    stats: dictionary with mean, standard deviation, minimum and maximum distance (normalized by nsteps) and the number of distinct protocols
+    '''
+    distances = hamming_distances(packed)
+    upper = distances[np.triu_indices(len(distances), k=1)]/nsteps
+    if len(upper) == 0:
+        upper = np.zeros(1)
+    distinct = len(np.unique(np.asarray(packed), axis=0))
+    return {"mean": float(upper.mean()), "std": float(upper.std()), "min": float(upper.min()), "max": float(upper.max()), "distinct": distinct}
@@ -0,0 +1,161 @@
+'''
+    Created on Oct 19th, 2026
+    @authors: Alberto Chimenti, Clara Eminente and Matteo Guida.
+    Purpose: (PYTHON3 IMPLEMENTATION)
+        Batched robustness evaluation of protocols over ensembles of perturbed scenarios (static field g, miscalibration of the control field
+        and noisy initial states).
+'''
+
+import numpy as np
+import argparse
+import json
+
+from Qmodel import compute_H_and_LA, ground_state
+
+########################
+## PARAMETERS ##########
+########################
+parser = argparse.ArgumentParser(prog = '\nRobustness of protocols for a L-qubit system\n',
+                            description = 'The program evaluates the fidelity of protocols (saved by script_SD.py or RL_training.py) over an ensemble of perturbed scenarios and prints the statistics of the fidelity distribution.')
+
+parser.add_argument('--store', type=str, nargs='?', default=None, help='Protocol store written by script_SD.py (e.g. L1_1flip/protocols)')
+parser.add_argument('--protocol', type=str, nargs='?', default=None, help='.npy file with one protocol (e.g. best_protocol_L_T.npy written by RL_training.py) or a matrix of protocols')
+parser.add_argument('--t_max', type=float, nargs='?', default=2.4, help='Total protocol time (protocols of the store with this T are evaluated)')
+parser.add_argument('--L', type=int, nargs='?', default=1, help='Number of qubits')
+parser.add_argument('--g', type=float, nargs='+', default=[0.9, 1, 1.1], help='Static field values of the ensemble')
+parser.add_argument('--scale', type=float, nargs='+', default=[0.95, 1, 1.05], help='Control field miscalibration factors of the ensemble')
+parser.add_argument('--n_states', type=int, nargs='?', default=100, help='Number of noisy initial states for each (g, scale)')
+parser.add_argument('--noise', type=float, nargs='?', default=0.05, help='Amplitude of the noise on the initial state')
+parser.add_argument('--seed', type=int, nargs='?', default=0, help='Seed of the noisy initial states')
+parser.add_argument('--out', type=str, nargs='?', default=None, help='Output .json file with the statistics of each protocol')
+
+########################
+########################
+########################
+
+
+def noisy_states(qstate, n_states, noise, seed=None):
+    '''
+    Perturbs a quantum state with complex gaussian noise (and normalizes it).
+
+    INPUTS:
+    qstate: np.array(dtype=complex) of size 2^L, the state to perturb
+    n_states: integer, number of perturbed states
+    noise: float, standard deviation of the real and imaginary part of the noise on each coefficient
+    seed: (optional) integer, seed of the noise
+
+    OUTPUTS:
+    qstates: np.array(dtype=complex) of size [n_states, 2^L]
+    '''
+    rng = np.random.RandomState(seed)
+    qstates = qstate[None,:] + noise*(rng.normal(size=(n_states, len(qstate))) + 1j*rng.normal(size=(n_states, len(qstate))))
+    return qstates/np.linalg.norm(qstates, axis=1, keepdims=True)
+
+
+def scenario_grid(qstart, g_values=[1], scales=[1], offsets=[0], n_states=1, noise=0, seed=None):
+    '''
+    Ensemble made of all the combinations of static field g, control field scale and offset (the applied field is scale*h + offset), each one
+    with n_states noisy initial states (see noisy_states).
+
+    OUTPUTS:
+    scenarios: dictionary of np.arrays of size n_scenarios with keys "g", "scale", "offset" and "qstart" (of size [n_scenarios, 2^L])
+    '''
+    g, scale, offset = [x.reshape(-1) for x in np.meshgrid(g_values, scales, offsets, indexing='ij')]
+    n_groups = len(g)
+    if noise > 0:
+        qstarts = noisy_states(np.asarray(qstart, dtype=complex), n_groups*n_states, noise, seed)
+    else:
+        qstarts = np.tile(np.asarray(qstart, dtype=complex), (n_groups*n_states, 1))
+    return {"g": np.repeat(g, n_states), "scale": np.repeat(scale, n_states), "offset": np.repeat(offset, n_states), "qstart": qstarts}
+
+
+def _run_lengths(protocol):
+    '''
+    Splits a protocol into runs of equal consecutive values: returns the values and the lengths of the runs
+    '''
+    protocol = np.asarray(protocol, dtype=float)
+    starts = np.concatenate([[0], np.nonzero(np.diff(protocol))[0] + 1])
+    lengths = np.diff(np.concatenate([starts, [len(protocol)]]))
+    return protocol[starts], lengths
+
+
+def evaluate_robustness(protocol, qtarget, L, T, qstart, g=1, scale=1, offset=0):
+    '''
+    Fidelity of a protocol in each scenario of an ensemble. The scenarios are grouped by hamiltonian (g, scale, offset): for each group the
+    initial states are propagated together as the columns of a state matrix, and each run of equal consecutive field values is applied with
+    a single propagator exp(-iH(h) dt*length) computed from the spectral decomposition of H(h).
+
+    INPUTS:
+    protocol: np.array of size nsteps, field values (e.g. Agent.best_protocol or a protocol saved by script_SD.py)
+    qtarget: np.array(dtype=complex) of size 2^L, target state
+    L: integer >0, number of Qubits
+    T: float, duration of the protocol
+    qstart: np.array(dtype=complex) of size [n_scenarios, 2^L] (or 2^L, the same initial state for all the scenarios)
+    g, scale, offset: floats or np.arrays of size n_scenarios, static field, scale and offset of the control field (applied field scale*h + offset)
+
+    OUTPUTS:
+    fidelities: np.array of size n_scenarios
+    '''
+    dt = T/len(protocol)
+    qstart = np.atleast_2d(np.asarray(qstart, dtype=complex))
+    n_scenarios = max(len(qstart), np.size(g), np.size(scale), np.size(offset))
+    params = np.stack([np.broadcast_to(np.asarray(x, dtype=float), (n_scenarios,)) for x in (g, scale, offset)], axis=1)
+    qstart = np.broadcast_to(qstart, (n_scenarios, qstart.shape[1]))
+
+    fields, lengths = _run_lengths(protocol)
+    groups, inverse = np.unique(params, axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1)
+
+    fidelities = np.zeros(n_scenarios)
+    for k, (g_k, scale_k, offset_k) in enumerate(groups):
+        members = np.nonzero(inverse == k)[0]
+        states = qstart[members].T
+        spectral = {}
+        for field, length in zip(fields, lengths):
+            if field not in spectral:
+                spectral[field] = compute_H_and_LA(L, g_k, scale_k*field + offset_k)
+            eigval, eigvect = spectral[field]["eigval"], spectral[field]["eigvect"]
+            states = eigvect @ (np.exp(-1j*eigval*dt*length)[:,None]*(eigvect.T.conj() @ states))
+        fidelities[members] = np.abs(np.conj(qtarget) @ states)**2
+    return fidelities
+
+
+def fidelity_summary(fidelities):
+    '''
+    Statistics of a fidelity distribution
+    '''
+    fidelities = np.asarray(fidelities)
+    return {"mean": float(fidelities.mean()), "std": float(fidelities.std()), "min": float(fidelities.min()),
+            "p05": float(np.percentile(fidelities, 5)), "median": float(np.median(fidelities)), "max": float(fidelities.max())}
+
+
+if __name__ == "__main__":
+
+    ### Parse input arguments
+    args = parser.parse_args()
+
+    if args.store is not None:
+        from protocol_store import protocol_store
+        store = protocol_store(args.store)
+        index = store.select(T=args.t_max, L=args.L)
+        protocols = store.protocols(index)
+    elif args.protocol is not None:
+        protocols = np.atleast_2d(np.load(args.protocol))
+    else:
+        parser.error("a protocol store (--store) or a protocol file (--protocol) is needed")
+
+    qstart = ground_state(args.L, -2)
+    qtarget = ground_state(args.L, +2)
+    scenarios = scenario_grid(qstart, args.g, args.scale, n_states=args.n_states, noise=args.noise, seed=args.seed)
+    print("Evaluating {} protocols over {} scenarios".format(len(protocols), len(scenarios["g"])))
+
+    results = []
+    for i, protocol in enumerate(protocols):
+        fidelities = evaluate_robustness(protocol, qtarget, args.L, args.t_max, scenarios["qstart"], scenarios["g"], scenarios["scale"], scenarios["offset"])
+        summary = fidelity_summary(fidelities)
+        results.append(summary)
+        print("Protocol {}: mean {:.4f} std {:.4f} min {:.4f} 5% {:.4f}".format(i, summary["mean"], summary["std"], summary["min"], summary["p05"]))
+
+    if args.out is not None:
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=2)
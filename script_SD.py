@@ -6,16 +6,18 @@
 '''
 
 import numpy as np
-import pandas as pd
-import matplotlib.pyplot as plt
 from tqdm import tqdm
 from SD import stochastic_descent,correlation
+from population import cross_entropy, genetic
 from Qmodel import compute_H_and_LA, compute_fidelity_ext, ground_state
+from protocol_store import protocol_store, packed_correlation
+import profiler_decorator
 import os
 import argparse
+import csv
+import json
 from pathlib import Path
 import warnings
-import pandas as pd
 warnings.filterwarnings('ignore')
 
 ########################
@@ -24,10 +26,15 @@ warnings.filterwarnings('ignore')
 parser = argparse.ArgumentParser(prog = '\nStochastic Descent to find optimal protocol for a L-qubit system\n',
                             description = 'The program maps each protocol into a chain of classical spins and search for the configuration that minimizes the infidelity.\nThis procedure is carried out "iter_for_each_time" for each protocol duration and for a choosen time grid.')
 
+parser.add_argument('--profile', type=str, nargs='?', const='', default=None, help='Accumulate timings of the instrumented sections and print them at exit (or save them to the given .json file)')
 parser.add_argument('--nsteps', type=int, nargs='?', default=100, help='Number of timesteps in the protocol')
 parser.add_argument('--L', type=int, nargs='?', default=1, help='Number of qubits to consider')
 parser.add_argument("--h", type=int, nargs="?", default=4, help='Control field value in bang-bang protocol')
 parser.add_argument('--nflip', type=int, nargs='?', default=1, help='Number of flips at a time allowed')
+parser.add_argument('--optimizer', type=str, nargs='?', default='sd', choices=['sd', 'ce', 'ga'], help='Optimiser: stochastic descent, cross-entropy method or genetic algorithm (see population.py)')
+parser.add_argument('--population', type=int, nargs='?', default=400, help='Protocols per generation of the ce and ga optimisers')
+parser.add_argument('--symmetric', action='store_true', help='Search only time-reflected protocols h(t) = -h(T-t) (flips of mirrored pairs of steps)')
+parser.add_argument('--no-plot', dest='no_plot', action='store_true', help='Headless mode: skip q(T) computation and plotting (matplotlib is not imported)')
 parser.add_argument('--iter_for_each_time', type=int, nargs='?', default=20, help='Number of results to average for each fixed t.')
 
 ########################
@@ -38,6 +45,8 @@ if __name__ == "__main__":
 
     ### Parse input arguments
     args = parser.parse_args()
+    if args.profile is not None:
+        profiler_decorator.enable(out=args.profile or None)
     
     h_list = [-args.h,args.h]
 
@@ -45,6 +54,7 @@ if __name__ == "__main__":
     print("Number of qubits (L):", args.L)
     print("Magnetic fields(h):", args.h)
     print("Timesteps (n_steps):", args.nsteps)
+    print("Optimizer:", args.optimizer)
     print("\n")
     print("\n")
 
@@ -59,8 +69,8 @@ if __name__ == "__main__":
     print("Repetition at each timestep:", args.iter_for_each_time)
     print("\n")
 
-    params_dict = {"L":args.L, "h":args.h, "timesteps":args.nsteps, "times":times, "iter_for_each_time": args.iter_for_each_time}
-    params_df = pd.DataFrame.from_dict(params_dict, orient="index")
+    params_dict = {"L":args.L, "h":args.h, "timesteps":args.nsteps, "times":times, "iter_for_each_time": args.iter_for_each_time,
+                   "optimizer": args.optimizer}
 
 
     # We set the ground states H at control fields hx = −2 and hx = 2 for the initial and target state.
@@ -72,23 +82,40 @@ if __name__ == "__main__":
     print("initial fidelity:",start_fidelity)
 
     # Save run parameters and date in custom named folder.
-    custom_name_dir = "L"+str(args.L)+"_"+str(args.nflip)+"flip"
+    custom_name_dir = "L"+str(args.L)+"_"+str(args.nflip)+"flip" if args.optimizer == 'sd' else "L"+str(args.L)+"_"+args.optimizer
     Path(custom_name_dir).mkdir(exist_ok=True)
-    Path(custom_name_dir+"/protocols").mkdir(exist_ok=True)
+    # Best protocols of all the runs are stored bit-packed together with their metadata (see protocol_store).
+    store = protocol_store(custom_name_dir+"/protocols", alphabet=h_list, nsteps=args.nsteps, overwrite=True)
 
-    params_df.to_csv(custom_name_dir+"/parameters.csv")
+    with open(custom_name_dir+"/parameters.csv", 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["", 0])
+        for key, value in params_dict.items():
+            writer.writerow([key, value])
 
     intermediete_result = False
+    # Throughput metrics summed over the iterations at each T.
+    stats_for_json = []
 
     # Iterate over the formed time-grid.
     for T in tqdm(times):
         temp_fid = []
         best_prot = []
+        T_stats = {"T": round(T, 2), "runs": 0}
         # For each time do iter_for_each_time for the sake of statistics. 
         for _ in range(args.iter_for_each_time):
 
-            best_protocol, fidelity = stochastic_descent(qstart=qstart, qtarget=qtarget, L=args.L, T=T, nsteps=args.nsteps, nflip=args.nflip, 
-                            field_list = h_list)
+            if args.optimizer == 'sd':
+                best_protocol, fidelity, run_stats = stochastic_descent(qstart=qstart, qtarget=qtarget, L=args.L, T=T, nsteps=args.nsteps, nflip=args.nflip, 
+                                field_list = h_list, return_stats=True, symmetric=args.symmetric)
+            else:
+                optimizer = cross_entropy if args.optimizer == 'ce' else genetic
+                best_protocol, fidelity, run_stats = optimizer(qstart=qstart, qtarget=qtarget, L=args.L, T=T, nsteps=args.nsteps, field_list=h_list,
+                                population=args.population, return_stats=True, symmetric=args.symmetric)
+            T_stats["runs"] += 1
+            for key, value in run_stats.items():
+                if key != "evaluations_per_second":
+                    T_stats[key] = T_stats.get(key, 0) + value
 
             # At fixed T we will have "iter_for_each_time" evaluations of fidelity.
             temp_fid.append(fidelity[-1])   
@@ -97,37 +124,40 @@ if __name__ == "__main__":
         # Fidelity evaluations are stored in the same "fidelity_fot_txt" variable that
         # Will have dimension len(times)*iter_for_each_time.
         fidelity_for_txt.append(temp_fid) 
+        T_stats["evaluations_per_second"] = T_stats["evaluations"]/max(T_stats["time_descent"], 1e-12)
+        stats_for_json.append(T_stats)
                                                 
-        best_prot = np.array([best_prot])
-
-        with open(custom_name_dir +'/protocols/testT'+str(round(T, 2))+'.npy', 'wb') as f:
-            np.save(f,best_prot)
-        f.close()
+        store.append(np.array(best_prot), temp_fid, args.L, 1, round(T, 2))
 
         if intermediete_result and T !=0: # If T = 0 q cannot be computed.
-            data = np.load(custom_name_dir +'/protocols/testT'+str(round(T, 3))+'.npy')[0,:,:] # First dimension is redundant.
+            data = store.packed()[store.select(T=round(T, 2))]
             print("Mean fidelity:", np.array(temp_fid).mean())
-            print("Q value is:", correlation(data, args.h))
+            print("Q value is:", packed_correlation(data, args.nsteps))
             print("\n")
             
     # Fidelity values are saved at the end.
     np.savetxt(custom_name_dir + '/fidelity_SD.txt', fidelity_for_txt, delimiter = ',',header="Matrix with as entries the values of fidelity dimension times x iterations")
+    # Throughput metrics are saved next to the fidelities.
+    with open(custom_name_dir + '/stats_SD.json', 'w') as f:
+        json.dump(stats_for_json, f, indent=2)
     times=np.insert(times,0,0)
 
-
+    if args.no_plot:
+        raise SystemExit
 
     # PLOTs. 
+    import matplotlib.pyplot as plt
     q=[]
+    packed = store.packed()
     for T in times[1:]:
-        data = np.load(custom_name_dir +"/protocols/testT"+str(round(T, 2))+".npy")[0,:,:] #first dimension is redundant 
-        q.append(correlation(data,args.h))
+        q.append(packed_correlation(packed[store.select(T=round(T, 2))], args.nsteps))
 
     times=np.concatenate([times_first_part,times_second_part])
     times=np.insert(times,0,0)
-    loaded_fidelity = pd.read_csv(custom_name_dir +'/fidelity_SD.txt', skiprows=1,header=None)
-    mean_fidelities = loaded_fidelity.mean(axis=1).values
+    loaded_fidelity = np.loadtxt(custom_name_dir +'/fidelity_SD.txt', delimiter=',', ndmin=2)
+    mean_fidelities = loaded_fidelity.mean(axis=1)
     mean_fidelities=np.insert(mean_fidelities,0,start_fidelity)
-    std_fidelities = loaded_fidelity.std(axis=1).values
+    std_fidelities = loaded_fidelity.std(axis=1, ddof=1)
     std_fidelities=np.insert(std_fidelities,0,0)
 
     q.insert(0,0)
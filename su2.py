@@ -0,0 +1,177 @@
+'''
+    Created on Oct 19th, 2026
+    @authors: Alberto Chimenti, Clara Eminente and Matteo Guida.
+    Purpose: (PYTHON3 IMPLEMENTATION)
+        Closed-form single qubit (L=1) backend: the propagators are unit quaternions, protocols are composed by quaternion multiplication
+        (vectorised over many protocols) and the fidelity is computed analytically.
+'''
+
+import numpy as np
+from Qmodel import quantum_model
+from profiler_decorator import timed
+
+
+def field_quaternions(fields, g, dt):
+    '''
+    Propagators exp(-iH(h)dt) of the single qubit hamiltonian H(h) = -h sigma_x/2 - g sigma_z/2 (Pauli matrices) as unit quaternions (a, v):
+    U = a I - i v.sigma with a = cos(|b|dt/2), v = -sin(|b|dt/2) b/|b|, b = (h, 0, g).
+
+    INPUTS:
+    fields: float or np.array of field values
+    g: float, static field along z-axis
+    dt: float, discrete timestep
+
+    OUTPUTS:
+    quaternions: np.array of size [..., 4], (a, vx, vy, vz) for each field value
+    '''
+    fields = np.asarray(fields, dtype=float)
+    norm = np.sqrt(fields**2 + g**2)
+    a = np.cos(norm*dt/2)
+    s = -np.sin(norm*dt/2)/np.where(norm > 0, norm, 1)
+    return np.stack([a, s*fields, np.zeros_like(fields), s*g*np.ones_like(fields)], axis=-1)
+
+
+def quaternion_product(q1, q2):
+    '''
+    Hamilton product, i.e. the quaternion of the product of the propagators U1 U2:
+    a = a1 a2 - v1.v2, v = a1 v2 + a2 v1 + v1 x v2
+
+    INPUTS:
+    q1, q2: np.arrays of size [..., 4]
+    '''
+    a1, x1, y1, z1 = q1[...,0], q1[...,1], q1[...,2], q1[...,3]
+    a2, x2, y2, z2 = q2[...,0], q2[...,1], q2[...,2], q2[...,3]
+    q = np.empty(np.broadcast(a1, a2).shape + (4,))
+    q[...,0] = a1*a2 - x1*x2 - y1*y2 - z1*z2
+    q[...,1] = a1*x2 + a2*x1 + y1*z2 - z1*y2
+    q[...,2] = a1*y2 + a2*y1 + z1*x2 - x1*z2
+    q[...,3] = a1*z2 + a2*z1 + x1*y2 - y1*x2
+    return q
+
+
+def compose(quaternions):
+    '''
+    Quaternion of a protocol, U_n ... U_2 U_1, computed with a pairwise (tree) reduction over the steps.
+
+    INPUTS:
+    quaternions: np.array of size [..., nsteps, 4], the quaternions of the steps (one or many protocols)
+
+    OUTPUTS:
+    quaternion: np.array of size [..., 4]
+    '''
+    q = np.asarray(quaternions, dtype=float)
+    while q.shape[-2] > 1:
+        if q.shape[-2]%2 == 1:
+            identity = np.zeros(q.shape[:-2] + (1, 4))
+            identity[...,0] = 1
+            q = np.concatenate([q, identity], axis=-2)
+        # later steps multiply from the left
+        q = quaternion_product(q[...,1::2,:], q[...,0::2,:])
+    return q[...,0,:]
+
+
+def apply_quaternion(q, qstate):
+    '''
+    Applies the propagator U = a I - i v.sigma of the quaternion(s) q to the state(s) qstate.
+
+    INPUTS:
+    q: np.array of size [..., 4]
+    qstate: np.array(dtype=complex) of size [..., 2]
+    '''
+    a, vx, vy, vz = q[...,0], q[...,1], q[...,2], q[...,3]
+    s0, s1 = qstate[...,0], qstate[...,1]
+    return np.stack([(a - 1j*vz)*s0 + (-1j*vx - vy)*s1, (-1j*vx + vy)*s0 + (a + 1j*vz)*s1], axis=-1)
+
+
+def protocol_fidelities(protocols, qstart, qtarget, g, dt):
+    '''
+    Fidelities of many single qubit protocols at once.
+
+    INPUTS:
+    protocols: np.array of size [n_protocols, nsteps], field values
+    qstart, qtarget: np.array(dtype=complex) of size 2, respectively the initial, target quantum states
+    g: float, static field along z-axis
+    dt: float, discrete timestep
+
+    OUTPUTS:
+    fidelities: np.array of size n_protocols
+    '''
+    protocols = np.atleast_2d(np.asarray(protocols, dtype=float))
+    # quaternions of the distinct field values, indexed by the protocols
+    fields, index = np.unique(protocols, return_inverse=True)
+    q = compose(field_quaternions(fields, g, dt)[index.reshape(protocols.shape)])
+    final = apply_quaternion(q, np.asarray(qstart, dtype=complex)[None,:])
+    return np.abs(final @ np.conj(qtarget))**2
+
+
+class su2_model(quantum_model):
+    '''
+
+    Single qubit (L=1) quantum_model whose evolution uses the closed-form propagators of field_quaternions instead of the spectral
+    decompositions. Same initialization variables of quantum_model (L must be 1).
+
+    '''
+    def __init__(self, qstart, qtarget, dt, L, g, h_list, history=True, **kwargs):
+        if L != 1:
+            raise ValueError("su2_model is a single qubit model (L=1)")
+        self.quaternions = {}
+        super().__init__(qstart, qtarget, dt, L, g, h_list, history=history, **kwargs)
+
+
+    def _quaternion(self, field):
+        q = self.quaternions.get(field)
+        if q is None:
+            q = field_quaternions(field, self.g, self.dt)
+            self.quaternions[field] = q
+        return q
+
+
+    @timed("evolve")
+    def evolve(self, field, check_norm=True):
+        '''
+
+        Evolves self.qcurrent with the field for a timestep dt (see quantum_model.evolve). The norm is conserved by construction.
+
+        '''
+        self.n_evolve += 1
+        a, vx, vy, vz = self._quaternion(field)
+        s0, s1 = self.qcurrent
+        self.qcurrent = np.array([(a - 1j*vz)*s0 + (-1j*vx - vy)*s1, (-1j*vx + vy)*s0 + (a + 1j*vz)*s1])
+
+        if self.history:
+            self.qstates_history.append(self.qcurrent)
+
+
+    def apply_protocol(self, protocol):
+        '''
+
+        Evolves self.qcurrent with the whole protocol composing the quaternions of the steps (the intermediate states are not stored).
+
+        '''
+        protocol = np.asarray(protocol, dtype=float)
+        self.n_evolve += len(protocol)
+        if len(protocol) == 0:
+            return
+        fields, index = np.unique(protocol, return_inverse=True)
+        quaternions = np.array([self._quaternion(field) for field in fields])
+        self.qcurrent = apply_quaternion(compose(quaternions[index]), np.asarray(self.qcurrent, dtype=complex))
+
+
+    def protocol_fidelities(self, protocols):
+        '''
+
+        Fidelities reached from self.qstart with many protocols at once (see protocol_fidelities)
+
+        '''
+        protocols = np.atleast_2d(protocols)
+        self.n_evolve += protocols.size
+        return protocol_fidelities(protocols, self.qstart, self.qtarget, self.g, self.dt)
+
+
+def make_model(qstart, qtarget, dt, L, g, h_list, **kwargs):
+    '''
+    Model used by the optimisers: su2_model for a single qubit, quantum_model otherwise (same arguments of quantum_model)
+    '''
+    if L == 1:
+        return su2_model(qstart, qtarget, dt, L, g, h_list, **kwargs)
+    return quantum_model(qstart, qtarget, dt, L, g, h_list, **kwargs)
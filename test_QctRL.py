@@ -0,0 +1,49 @@
+'''
+    Created on Oct 19th, 2026
+    @authors: Alberto Chimenti, Clara Eminente and Matteo Guida.
+    Purpose: (PYTHON3 IMPLEMENTATION)
+        Tests of the checkpoint/resume of Agent.train_agent (run with pytest)
+'''
+
+import numpy as np
+
+from Qmodel import ground_state
+from QctRL import Agent
+from su2 import make_model
+
+
+def _agent(nsteps=10, actions=(-4, 4), L=1, T=1.):
+    model = make_model(ground_state(L, -2), ground_state(L, +2), T/nsteps, L, 1, list(actions))
+    agent = Agent(nsteps, len(actions))
+    agent._init_evironment(model, 0, list(actions))
+    return agent
+
+
+def test_resume_after_early_stop(tmp_path):
+    episodes, replay_freq, replay_episodes = 300, 50, 10
+    alpha = np.linspace(0.9, 0.1, episodes)
+    checkpoint = tmp_path / "checkpoint.npz"
+    log_file = tmp_path / "logs.npy"
+    kwargs = dict(conv_check=None, early_stop=50, stop_tol=1, checkpoint=checkpoint, checkpoint_freq=20, log_file=log_file, progress=False)
+
+    np.random.seed(0)
+    agent = _agent()
+    agent.train_agent(0, episodes, alpha, replay_freq, replay_episodes, **kwargs)
+    assert agent.stop_episode is not None
+    # the early stop truncates the log file
+    total_episodes = episodes + ((episodes-1)//replay_freq)*replay_episodes
+    assert np.load(log_file).shape[1] < total_episodes + 1
+
+    with np.load(checkpoint) as state:
+        saved_logs = state['logs']
+        n_log = int(state['n_log'])
+
+    # resume and train until the end (past the truncated log file)
+    kwargs["early_stop"] = None
+    agent = _agent()
+    rewards, mavg_rewards, epsilons = agent.train_agent(0, episodes, alpha, replay_freq, replay_episodes, resume=True, **kwargs)
+    assert len(rewards) == total_episodes + 1
+    # the logs before the checkpoint are restored from it
+    np.testing.assert_array_equal(mavg_rewards[:n_log+1], saved_logs[1])
+    np.testing.assert_array_equal(epsilons[:n_log+1], saved_logs[2])
+    np.testing.assert_array_equal(np.load(log_file)[:, :len(rewards)], np.stack([rewards, mavg_rewards, epsilons]))
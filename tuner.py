@@ -0,0 +1,231 @@
+'''
+    Created on Oct 19th, 2026
+    @authors: Alberto Chimenti, Clara Eminente and Matteo Guida.
+    Purpose: (PYTHON3 IMPLEMENTATION)
+        Hyperparameter search for the RL Agent with successive halving (and Hyperband): many configurations are trained in parallel processes on
+        short budgets, the best fraction is kept and trained again with a geometrically larger number of episodes.
+'''
+
+import numpy as np
+import argparse
+import json
+import time
+from multiprocessing import Pool
+
+from Qmodel import ground_state
+from QctRL import Agent
+from su2 import make_model
+
+########################
+## PARAMETERS ##########
+########################
+parser = argparse.ArgumentParser(prog = '\nHyperparameter search for the RL Agent on a L-qubit system\n',
+                            description = 'The program samples Agent configurations (learning rate schedule, lambda, discount, behavioural policy and epsilon decay), trains them with successive halving (or Hyperband) and prints the leaderboard with the fidelity reached and the compute spent.')
+
+parser.add_argument('--t_max', type=float, nargs='?', default=2.4, help='Total protocol time')
+parser.add_argument('--nsteps', type=int, nargs='?', default=60, help='Number of timesteps in the protocol')
+parser.add_argument('--L', type=int, nargs='?', default=1, help='Number of qubits to consider')
+parser.add_argument('--g', type=float, nargs='?', default=1, help='Static field value')
+parser.add_argument("--actions", type=int, nargs="+", default=[-4, 4], help='List of possible magnetic field values')
+parser.add_argument('--configs', type=int, nargs='?', default=27, help='Number of sampled configurations (of the largest bracket with --hyperband)')
+parser.add_argument('--min_episodes', type=int, nargs='?', default=200, help='Episode budget of the first rung')
+parser.add_argument('--max_episodes', type=int, nargs='?', default=5000, help='Maximum episode budget of a configuration')
+parser.add_argument('--eta', type=int, nargs='?', default=3, help='Reduction factor: 1/eta of the configurations is kept and their budget is multiplied by eta')
+parser.add_argument('--hyperband', action='store_true', help='Run the Hyperband brackets instead of a single successive halving')
+parser.add_argument('--processes', type=int, nargs='?', default=1, help='Number of parallel training processes')
+parser.add_argument('--seed', type=int, nargs='?', default=0, help='Seed of the configuration sampling and of the trainings')
+parser.add_argument('--out', type=str, nargs='?', default=None, help='Output .json file with the leaderboard')
+
+########################
+########################
+########################
+
+
+# Values sampled for each hyperparameter (see Agent and Agent.update_greedyness).
+default_space = {
+    "alpha_i": [0.5, 0.7, 0.9],
+    "alpha_f": [0.1, 0.5, 0.89],
+    "lambda": [0.6, 0.8, 0.9, 1.0],
+    "discount": [0.9, 0.99, 1.0],
+    "softmax": [True, False],
+    "decay_steps": [5, 10, 20],
+    "decay_temperature": [4, 8, 12],
+}
+
+
+def sample_configs(n_configs, space=default_space, seed=None):
+    '''
+    Samples configurations uniformly from the values of each hyperparameter
+
+    OUTPUTS:
+    configs: list of dictionaries {hyperparameter: value}
+    '''
+    rng = np.random.RandomState(seed)
+    configs = []
+    for _ in range(n_configs):
+        config = {}
+        for name, values in space.items():
+            value = values[rng.randint(len(values))]
+            config[name] = value.item() if isinstance(value, np.generic) else value
+        configs.append(config)
+    return configs
+
+
+def train_config(config, qstart, qtarget, L, T, nsteps, all_actions, episodes, g=1, starting_action=0, replay_freq=50, replay_episodes=40,
+                 seed=None):
+    '''
+    Trains an Agent with the given configuration from scratch
+
+    INPUTS:
+    config: dictionary with keys alpha_i, alpha_f (linear learning rate schedule) and any Agent keyword (lambda, discount, softmax, decay_steps,
+            decay_temperature, ...)
+    qstart, qtarget, L, T, nsteps, all_actions, g: problem definition (see RL_training.py)
+    episodes: integer, training episodes
+    starting_action, replay_freq, replay_episodes: see Agent.train_agent
+    seed: (optional) integer, seed of the training
+
+    OUTPUTS:
+    result: dictionary with the best and greedy protocol fidelity, the episodes (including replays), evolution steps and time spent
+    '''
+    start_time = time.perf_counter()
+    if seed is not None:
+        np.random.seed(seed)
+    agent_kwargs = {k: v for k, v in config.items() if k not in ("alpha_i", "alpha_f")}
+    model = make_model(qstart, qtarget, T/nsteps, L, g, all_actions)
+    learner = Agent(nsteps, len(all_actions), **agent_kwargs)
+    learner._init_evironment(model, starting_action, all_actions)
+    alpha = np.linspace(config.get("alpha_i", 0.9), config.get("alpha_f", 0.89), episodes)
+    rewards, _, _ = learner.train_agent(starting_action, episodes, alpha, replay_freq, replay_episodes, verbose=False, conv_check=None,
+                                        progress=False)
+    return {"fidelity": float(learner.best_reward), "greedy_fidelity": float(rewards[-1]), "episodes": len(rewards) - 1,
+            "evolve_calls": model.n_evolve, "time": time.perf_counter() - start_time}
+
+
+def _train_trial(trial):
+    config, problem, episodes, seed = trial
+    return train_config(config, episodes=episodes, seed=seed, **problem)
+
+
+def successive_halving(configs, problem, min_episodes, max_episodes, eta=3, processes=1, seed=0, pool=None, verbose=True):
+    '''
+    Successive halving: all the configurations are trained with min_episodes, the best 1/eta (by best protocol fidelity) are trained again
+    from scratch with eta times more episodes, and so on until one configuration is left or max_episodes is reached.
+
+    INPUTS:
+    configs: list of configurations (see sample_configs)
+    problem: dictionary with the arguments of train_config describing the problem (qstart, qtarget, L, T, nsteps, all_actions, g, ...)
+    min_episodes, max_episodes: integers, budget of the first rung and maximum budget
+    eta: integer, reduction factor
+    processes: integer, number of parallel training processes (ignored if a pool is given)
+    seed: integer, seed of the trainings (configuration i always uses seed+i)
+    pool: (optional) multiprocessing.Pool to use
+
+    OUTPUTS:
+    leaderboard: list of dictionaries (one per configuration, best first) with the configuration, the last rung reached, the fidelities of the
+                 last rung, the total episodes, evolution steps and time spent on it and the fidelity gain (over the fidelity between qstart
+                 and qtarget) per 1000 episodes spent
+    '''
+    own_pool = pool is None and processes > 1
+    if own_pool:
+        pool = Pool(processes)
+    entries = [{"config": config, "rung": -1, "fidelity": -1., "greedy_fidelity": -1., "episodes": 0, "evolve_calls": 0, "time": 0.}
+               for config in configs]
+    alive = list(range(len(configs)))
+    episodes = min_episodes
+    rung = 0
+    try:
+        while alive:
+            trials = [(configs[i], problem, episodes, seed + i) for i in alive]
+            results = pool.map(_train_trial, trials) if pool is not None else [_train_trial(trial) for trial in trials]
+            for i, result in zip(alive, results):
+                entry = entries[i]
+                entry["rung"] = rung
+                entry["fidelity"] = result["fidelity"]
+                entry["greedy_fidelity"] = result["greedy_fidelity"]
+                entry["rung_episodes"] = episodes
+                for key in ("episodes", "evolve_calls", "time"):
+                    entry[key] += result[key]
+            if verbose:
+                best = max(entries[i]["fidelity"] for i in alive)
+                print("Rung {}: {} configurations with {} episodes, best fidelity {:.6f}".format(rung, len(alive), episodes, best))
+
+            if len(alive) == 1 or episodes >= max_episodes:
+                break
+            alive = sorted(alive, key=lambda i: entries[i]["fidelity"], reverse=True)[:max(len(alive)//eta, 1)]
+            episodes = min(episodes*eta, max_episodes)
+            rung += 1
+    finally:
+        if own_pool:
+            pool.close()
+            pool.join()
+
+    start_fidelity = float(np.abs(np.vdot(problem["qstart"], problem["qtarget"]))**2)
+    for entry in entries:
+        entry["gain_per_kepisode"] = (entry["fidelity"] - start_fidelity)/max(entry["episodes"], 1)*1000
+    return sorted(entries, key=lambda entry: (entry["rung"], entry["fidelity"]), reverse=True)
+
+
+def hyperband(problem, min_episodes, max_episodes, eta=3, n_configs=None, space=default_space, processes=1, seed=0, verbose=True):
+    '''
+    Hyperband: successive halving brackets trading the number of configurations for the starting budget. Bracket s starts
+    ceil((s_max+1)/(s+1))*eta^s configurations with max_episodes/eta^s episodes (never less than min_episodes), s = s_max, ..., 0.
+
+    INPUTS:
+    problem, min_episodes, max_episodes, eta, processes, seed: see successive_halving
+    n_configs: (optional) integer, configurations of the largest bracket (default eta^s_max)
+    space: dictionary of the sampled values of each hyperparameter (see sample_configs)
+
+    OUTPUTS:
+    leaderboard: the entries of all the brackets (see successive_halving) with the bracket index, best last rung and fidelity first
+    '''
+    s_max = int(np.floor(np.log(max_episodes/min_episodes)/np.log(eta) + 1e-9))
+    pool = Pool(processes) if processes > 1 else None
+    leaderboard = []
+    try:
+        for s in range(s_max, -1, -1):
+            n = int(np.ceil((s_max + 1)/(s + 1)*eta**s))
+            if n_configs is not None:
+                n = max(int(np.ceil(n*n_configs/eta**s_max)), 1)
+            episodes = max(int(max_episodes/eta**s), min_episodes)
+            if verbose:
+                print("\nBracket {}: {} configurations from {} episodes".format(s, n, episodes))
+            configs = sample_configs(n, space, seed + s)
+            entries = successive_halving(configs, problem, episodes, max_episodes, eta=eta, seed=seed + 1000*s, pool=pool, verbose=verbose)
+            for entry in entries:
+                entry["bracket"] = s
+            leaderboard += entries
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return sorted(leaderboard, key=lambda entry: (entry["rung_episodes"], entry["fidelity"]), reverse=True)
+
+
+if __name__ == "__main__":
+
+    ### Parse input arguments
+    args = parser.parse_args()
+
+    qstart = ground_state(args.L, -2)
+    qtarget = ground_state(args.L, +2)
+    problem = {"qstart": qstart, "qtarget": qtarget, "L": args.L, "T": args.t_max, "nsteps": args.nsteps, "all_actions": args.actions, "g": args.g}
+
+    start_time = time.perf_counter()
+    if args.hyperband:
+        leaderboard = hyperband(problem, args.min_episodes, args.max_episodes, eta=args.eta, n_configs=args.configs, processes=args.processes,
+                                seed=args.seed)
+    else:
+        configs = sample_configs(args.configs, seed=args.seed)
+        leaderboard = successive_halving(configs, problem, args.min_episodes, args.max_episodes, eta=args.eta, processes=args.processes,
+                                         seed=args.seed)
+    total_episodes = sum(entry["episodes"] for entry in leaderboard)
+    print("\nTotal: {} episodes in {:.1f} s".format(total_episodes, time.perf_counter() - start_time))
+
+    print("\n{:>4} {:>9} {:>10} {:>10} {:>9} {:>12}  {}".format("rank", "episodes", "fidelity", "greedy", "spent", "gain/kep", "configuration"))
+    for rank, entry in enumerate(leaderboard[:10]):
+        print("{:>4} {:>9} {:>10.6f} {:>10.6f} {:>9} {:>12.4f}  {}".format(rank, entry["rung_episodes"], entry["fidelity"], entry["greedy_fidelity"],
+                                                                         entry["episodes"], entry["gain_per_kepisode"], entry["config"]))
+
+    if args.out is not None:
+        with open(args.out, 'w') as f:
+            json.dump(leaderboard, f, indent=2)